@@ -0,0 +1,183 @@
+"""Inspecting and managing the state of a running bot.
+
+Usage: python admin.py [--state FILE] COMMAND
+
+    list [--limit N] [--offset N]   subscriptions by next due time
+    show CHAT_ID                    cursor and last statuses of a chat
+    poll CHAT_ID                    poll a chat now, sending its changes
+    failed [--limit N]              deliveries that failed
+    replay ID                       send a failed delivery again
+    queues                          sink queue depths and counters
+
+Answers come from indexed queries of the state store and from the
+metrics file written by the bot after every round.
+"""
+import argparse
+import json
+import logging
+import sys
+import time
+from datetime import datetime
+from typing import Optional, TextIO
+
+import homework
+from state import decode_status
+from storage import Storage
+
+logger = logging.getLogger(__name__)
+
+
+def mask(token: str) -> str:
+    """Hiding a token except for its last characters."""
+    return '*' * max(len(token) - 4, 0) + token[-4:]
+
+
+def format_time(timestamp: float) -> str:
+    """Formatting a unix time, 0 is shown as never."""
+    if not timestamp:
+        return 'never'
+    return datetime.fromtimestamp(timestamp).isoformat(sep=' ',
+                                                       timespec='seconds')
+
+
+def list_subscriptions(storage: Storage, out: TextIO, limit: int = 20,
+                       offset: int = 0) -> None:
+    """Printing subscriptions, the most overdue first."""
+    out.write(f'{storage.count()} subscriptions\n')
+    out.write('chat_id\tcursor\tnext_due\thomeworks\n')
+    for chat_id, cursor, next_due, homeworks in storage.list_subscriptions(
+        limit, offset
+    ):
+        out.write(f'{chat_id}\t{format_time(cursor)}\t'
+                  f'{format_time(next_due)}\t{homeworks}\n')
+
+
+def show_subscription(storage: Storage, out: TextIO, chat_id: str) -> bool:
+    """Printing the cursor and statuses of a chat."""
+    subscription = storage.load_subscription(chat_id)
+    if subscription is None:
+        out.write(f'No subscription for chat {chat_id}\n')
+        return False
+    out.write(f'chat_id: {subscription.chat_id}\n'
+              f'token: {mask(subscription.token)}\n'
+              f'cursor: {format_time(subscription.cursor)}\n'
+              f'next_due: {format_time(subscription.next_due)}\n')
+    for record in subscription.records():
+        out.write(f'{record.homework_id}\t{record.name}\t'
+                  f'{decode_status(record.status)}\t'
+                  f'{format_time(record.updated)}\n')
+    return True
+
+
+def poll_subscription(storage: Storage, out: TextIO, chat_id: str) -> bool:
+    """Polling one chat right away."""
+    subscription = storage.load_subscription(chat_id)
+    if subscription is None:
+        out.write(f'No subscription for chat {chat_id}\n')
+        return False
+    sent = homework.run_once(storage, [subscription])
+    out.write(f'{sent} changes of chat {chat_id}\n')
+    return True
+
+
+def list_failures(storage: Storage, out: TextIO, limit: int = 20) -> None:
+    """Printing failed deliveries."""
+    out.write('id\tchat_id\thomework\tstatus\tfailed_at\terror\n')
+    for failure_id, change, error, failed_at in storage.failures(limit):
+        out.write(f'{failure_id}\t{change.chat_id}\t'
+                  f'{change.homework_name}\t{change.status}\t'
+                  f'{format_time(failed_at)}\t{error}\n')
+
+
+def replay_failure(storage: Storage, out: TextIO, failure_id: int,
+                   bot=None) -> bool:
+    """Sending a failed delivery again, forgetting it once delivered."""
+    change = storage.get_failure(failure_id)
+    if change is None:
+        out.write(f'No failed delivery {failure_id}\n')
+        return False
+    if bot is None:
+        bot = homework.telegram.Bot(token=homework.TELEGRAM_TOKEN)
+    if not homework.send_to_chat(bot, change.chat_id,
+                                 homework.render_change(change)):
+        out.write(f'Delivery {failure_id} failed again\n')
+        return False
+    storage.delete_failure(failure_id)
+    out.write(f'Delivery {failure_id} replayed\n')
+    return True
+
+
+def show_queues(out: TextIO, path: Optional[str] = None) -> bool:
+    """Printing sink gauges of the last metrics dump."""
+    path = path or homework.METRICS_FILE
+    if not path:
+        out.write('No metrics, METRICS_FILE is not set\n')
+        return False
+    try:
+        with open(path, encoding='utf-8') as file:
+            gauges = json.load(file)['gauges']
+    except (OSError, ValueError, KeyError) as error:
+        out.write(f'No metrics in {path}: {error}\n')
+        return False
+    for name in sorted(gauges):
+        if name.startswith(('queue.', 'sink.')):
+            out.write(f'{name}\t{gauges[name]:g}\n')
+    return True
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Building the parser of admin commands."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        '--state', default=homework.STATE_FILE or homework.DEFAULT_STATE_FILE
+    )
+    parser.add_argument('--metrics', default=homework.METRICS_FILE)
+    commands = parser.add_subparsers(dest='command', required=True)
+    command = commands.add_parser('list', help='subscriptions by next due')
+    command.add_argument('--limit', type=int, default=20)
+    command.add_argument('--offset', type=int, default=0)
+    commands.add_parser('show', help='state of a chat').add_argument(
+        'chat_id'
+    )
+    commands.add_parser('poll', help='poll a chat now').add_argument(
+        'chat_id'
+    )
+    commands.add_parser('failed', help='failed deliveries').add_argument(
+        '--limit', type=int, default=20
+    )
+    commands.add_parser('replay', help='resend a failed delivery'
+                        ).add_argument('id', type=int)
+    commands.add_parser('queues', help='sink queue depths')
+    return parser
+
+
+def cli(argv=None, out: TextIO = sys.stdout) -> int:
+    """Running an admin command, returning the exit code."""
+    args = build_parser().parse_args(argv)
+    if args.command == 'queues':
+        return 0 if show_queues(out, args.metrics) else 1
+    started = time.perf_counter()
+    with Storage(args.state) as storage:
+        if args.command == 'list':
+            list_subscriptions(storage, out, args.limit, args.offset)
+            done = True
+        elif args.command == 'show':
+            done = show_subscription(storage, out, args.chat_id)
+        elif args.command == 'poll':
+            done = poll_subscription(storage, out, args.chat_id)
+        elif args.command == 'failed':
+            list_failures(storage, out, args.limit)
+            done = True
+        else:
+            done = replay_failure(storage, out, args.id)
+    logger.debug(f'{args.command} took '
+                 f'{(time.perf_counter() - started) * 1000:.1f} ms')
+    return 0 if done else 1
+
+
+if __name__ == '__main__':
+    logging.basicConfig(
+        format='%(asctime)s | %(levelname)s | %(message)s',
+        level=logging.INFO, stream=sys.stderr
+    )
+    sys.exit(cli())
@@ -0,0 +1,142 @@
+"""Bulk import of full homework histories without notifications.
+
+Usage: python backfill.py tokens.txt [--workers 8] [--rate 5]
+
+Histories (from_date=0) of many tokens are fetched concurrently under a
+shared rate limit and written to the state store in batches. Nothing is
+sent to Telegram: the live loop only reports what changes afterwards.
+"""
+import argparse
+import logging
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Iterable, NamedTuple, Tuple
+
+from clock import system_clock
+from homework import (DEFAULT_STATE_FILE, STATE_FILE, auth_headers,
+                      read_tokens, stream_api)
+from state import Subscription
+from storage import Storage
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimiter:
+    """Token bucket shared by worker threads."""
+
+    def __init__(self, rate: float, burst: int = 1,
+                 clock=system_clock) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self._tokens = float(burst)
+        self._updated = clock.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Waiting until a request is allowed."""
+        while True:
+            with self._lock:
+                now = self.clock.monotonic()
+                self._tokens = min(
+                    self.burst,
+                    self._tokens + (now - self._updated) * self.rate
+                )
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            self.clock.sleep(wait)
+
+
+class BackfillReport(NamedTuple):
+    """Outcome of a backfill."""
+
+    tokens: int
+    failed: int
+    homeworks: int
+    seconds: float
+
+    @property
+    def rate(self) -> float:
+        """Throughput in tokens per second."""
+        return self.tokens / self.seconds if self.seconds else 0.0
+
+
+def fetch_history(chat_id, token: str, limiter: RateLimiter) -> Subscription:
+    """Fetching the full history of a token into a new subscription.
+
+    The response is parsed as it arrives, so long histories are never
+    held in memory as a whole.
+    """
+    limiter.acquire()
+    homeworks = stream_api(0, auth_headers(token))
+    subscription = Subscription(chat_id, token)
+    for homework in homeworks:
+        subscription.update(homework)
+    subscription.cursor = homeworks.current_date
+    return subscription
+
+
+def backfill(storage: Storage, pairs: Iterable[Tuple[str, str]],
+             workers: int = 8, rate: float = 5.0,
+             batch_size: int = 500) -> BackfillReport:
+    """Importing histories of (chat_id, token) pairs into the storage."""
+    started = time.perf_counter()
+    limiter = RateLimiter(rate, burst=workers)
+    batch = []
+    done = failed = homeworks = 0
+    with ThreadPoolExecutor(workers) as executor:
+        futures = {
+            executor.submit(fetch_history, chat_id, token, limiter): chat_id
+            for chat_id, token in pairs
+        }
+        for future in as_completed(futures):
+            try:
+                subscription = future.result()
+            except Exception as error:
+                failed += 1
+                logger.error(f'Backfill of chat {futures[future]} failed: '
+                             f'{error}')
+                continue
+            done += 1
+            homeworks += len(subscription)
+            batch.append(subscription)
+            if len(batch) >= batch_size:
+                storage.save(batch)
+                batch = []
+    if batch:
+        storage.save(batch)
+    return BackfillReport(done, failed, homeworks,
+                          time.perf_counter() - started)
+
+
+def cli(argv=None) -> None:
+    """Running a backfill from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('tokens', help='file of "chat_id token" pairs')
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--rate', type=float, default=5.0,
+                        help='requests per second, default: %(default)s')
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--state', default=STATE_FILE or DEFAULT_STATE_FILE)
+    args = parser.parse_args(argv)
+    logging.basicConfig(
+        format='%(asctime)s | %(levelname)s | %(message)s',
+        level=logging.INFO, stream=sys.stdout
+    )
+    with Storage(args.state) as storage:
+        report = backfill(storage, read_tokens(args.tokens), args.workers,
+                          args.rate, args.batch_size)
+    logger.info(
+        f'Backfilled {report.tokens} tokens ({report.failed} failed, '
+        f'{report.homeworks} homeworks) in {report.seconds:.1f} s, '
+        f'{report.rate:.1f} tokens/s'
+    )
+
+
+if __name__ == '__main__':
+    cli()
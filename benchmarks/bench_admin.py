@@ -0,0 +1,50 @@
+"""Measuring admin queries against a store of many subscriptions.
+
+Run from the repository root: python benchmarks/bench_admin.py
+"""
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from admin import list_subscriptions, show_subscription  # noqa: E402
+from state import Subscription  # noqa: E402
+from storage import Storage  # noqa: E402
+
+SUBSCRIPTIONS = 100_000
+TARGET_MS = 50
+
+
+def query_milliseconds(count: int = SUBSCRIPTIONS) -> dict:
+    """Filling a store with count subscriptions and timing the queries."""
+    with tempfile.TemporaryDirectory() as directory:
+        with Storage(os.path.join(directory, 'state.sqlite3')) as storage:
+            subscriptions = []
+            for number in range(count):
+                subscription = Subscription(str(number), f'y0_{number}',
+                                            1_600_000_000)
+                subscription.next_due = (number * 7919) % count
+                subscription.set(number, f'hw{number}', 0,
+                                 1_600_000_000)
+                subscriptions.append(subscription)
+            storage.save(subscriptions)
+            timings = {}
+            for name, query in (
+                ('list', lambda out: list_subscriptions(storage, out)),
+                ('show', lambda out: show_subscription(
+                    storage, out, str(count // 2))),
+            ):
+                started = time.perf_counter()
+                query(io.StringIO())
+                timings[name] = (time.perf_counter() - started) * 1000
+            return timings
+
+
+if __name__ == '__main__':
+    results = query_milliseconds()
+    for name, milliseconds in results.items():
+        print(f'{name}: {milliseconds:.2f} ms (target {TARGET_MS} ms)')
+    sys.exit(max(results.values()) > TARGET_MS)
@@ -0,0 +1,49 @@
+"""Measuring the deduplication store with a million keys.
+
+Run from the repository root: python benchmarks/bench_dedup.py
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from changes import StatusChange  # noqa: E402
+from clock import VirtualClock  # noqa: E402
+from dedup import DedupStore, delivery_key  # noqa: E402
+
+KEYS = 1_000_000
+LOOKUPS = 200_000
+TARGET_NS = 5000
+
+
+def measure(count: int = KEYS, lookups: int = LOOKUPS) -> dict:
+    """Bytes per key and nanoseconds per lookup of a full store."""
+    clock = VirtualClock(0)
+    tracemalloc.start()
+    dedup = DedupStore(maxsize=count, clock=clock)
+    for key in range(count):
+        dedup.add(key * 2654435761 % 2**63)
+    used = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    change = StatusChange('1', 1, 'hw', None, 'approved', 0)
+    keys = [
+        delivery_key(change._replace(homework_id=number))
+        for number in range(lookups)
+    ]
+    started = time.perf_counter_ns()
+    for key in keys:
+        if key not in dedup:
+            dedup.add(key)
+    lookup_ns = (time.perf_counter_ns() - started) / lookups
+    return {'bytes_per_key': used / count, 'lookup_ns': lookup_ns,
+            'size': len(dedup)}
+
+
+if __name__ == '__main__':
+    result = measure()
+    print(f'{result["bytes_per_key"]:.0f} bytes per key, '
+          f'{result["lookup_ns"]:.0f} ns per check and add '
+          f'(target {TARGET_NS} ns), {result["size"]} keys')
+    sys.exit(result['lookup_ns'] > TARGET_NS)
@@ -0,0 +1,90 @@
+"""Measuring cold start: import time, fail-fast exit and first poll latency.
+
+Every sample runs in a fresh interpreter. Run from the repository root:
+python benchmarks/bench_startup.py
+"""
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RUNS = 10
+
+IMPORT_SCRIPT = '''
+import time
+started = time.perf_counter()
+import homework
+print(time.perf_counter() - started)
+'''
+
+FIRST_POLL_SCRIPT = '''
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+
+class Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = json.dumps({'homeworks': [], 'current_date': 0}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+server = HTTPServer(('127.0.0.1', 0), Handler)
+threading.Thread(target=server.serve_forever, daemon=True).start()
+started = time.perf_counter()
+import homework
+homework.ENDPOINT = f'http://127.0.0.1:{server.server_port}/'
+homework.check_response(homework.get_api_answer(0))
+print(time.perf_counter() - started)
+'''
+
+
+def _environment(**values) -> dict:
+    environment = {
+        key: value for key, value in os.environ.items()
+        if key not in ('PRACTICUM_TOKEN', 'TELEGRAM_TOKEN',
+                       'TELEGRAM_CHAT_ID')
+    }
+    environment.update(values)
+    return environment
+
+
+def measure_script(script: str) -> float:
+    """Median seconds reported by a script run in fresh interpreters."""
+    samples = []
+    for _ in range(RUNS):
+        output = subprocess.run(
+            [sys.executable, '-c', script], cwd=ROOT, check=True,
+            capture_output=True, text=True, env=_environment(),
+        ).stdout
+        samples.append(float(output.split()[-1]))
+    return statistics.median(samples)
+
+
+def measure_fail_fast() -> float:
+    """Median seconds for the bot to exit when tokens are missing."""
+    samples = []
+    for _ in range(RUNS):
+        started = time.perf_counter()
+        subprocess.run(
+            [sys.executable, 'homework.py'], cwd=ROOT,
+            capture_output=True, env=_environment(),
+        )
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples)
+
+
+if __name__ == '__main__':
+    print(f'import homework: {measure_script(IMPORT_SCRIPT) * 1000:.1f} ms')
+    print(f'exit without tokens: {measure_fail_fast() * 1000:.1f} ms')
+    print(f'first poll: {measure_script(FIRST_POLL_SCRIPT) * 1000:.1f} ms')
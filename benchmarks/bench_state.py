@@ -0,0 +1,68 @@
+"""Measuring memory of one subscription and time of a long history.
+
+Run from the repository root: python benchmarks/bench_state.py
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from changes import detect_changes  # noqa: E402
+from state import STATUSES, StateStore, Subscription  # noqa: E402
+
+SUBSCRIPTIONS = 100_000
+HOMEWORKS_PER_SUBSCRIPTION = 1
+TARGET_BYTES = 600
+HISTORY = 50_000
+TARGET_HISTORY_SECONDS = 2.0
+
+
+def bytes_per_subscription(
+        count: int = SUBSCRIPTIONS,
+        homeworks: int = HOMEWORKS_PER_SUBSCRIPTION) -> float:
+    """Building a store of count subscriptions and measuring its size."""
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    store = StateStore()
+    for number in range(count):
+        subscription = store.subscribe(
+            100_000_000 + number, f'y0_{number:040d}', 1_000_000_000
+        )
+        for homework in range(homeworks):
+            subscription.set(
+                number * 100 + homework,
+                f'student{number}__hw{homework:02d}.zip',
+                homework % 3,
+                1_600_000_000,
+            )
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    used = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+    return used / count
+
+
+def history_seconds(homeworks: int = HISTORY) -> float:
+    """Detecting changes of a long history twice, as a backfill would."""
+    answer = [
+        {'id': number, 'homework_name': f'student__hw{number}.zip',
+         'status': STATUSES[number % 3]}
+        for number in range(homeworks)
+    ]
+    moved = [dict(homework, status=STATUSES[(number + 1) % 3])
+             for number, homework in enumerate(answer)]
+    started = time.perf_counter()
+    subscription = Subscription(1, 'y0_token')
+    detect_changes(subscription, answer)
+    detect_changes(subscription, moved)
+    return time.perf_counter() - started
+
+
+if __name__ == '__main__':
+    result = bytes_per_subscription()
+    print(f'{result:.0f} bytes per subscription (target {TARGET_BYTES})')
+    seconds = history_seconds()
+    print(f'{seconds:.2f} s for a history of {HISTORY} homeworks '
+          f'(target {TARGET_HISTORY_SECONDS})')
+    sys.exit(result > TARGET_BYTES or seconds > TARGET_HISTORY_SECONDS)
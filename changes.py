@@ -0,0 +1,76 @@
+"""Detecting homework status transitions and streaming them as events."""
+from typing import Callable, Iterable, List, NamedTuple, Optional
+
+from state import (Subscription, decode_status, encode_status, homework_key,
+                   parse_date)
+
+
+class StatusChange(NamedTuple):
+    """A homework of a chat moved to a new review status."""
+
+    chat_id: object
+    homework_id: int
+    homework_name: str
+    old_status: Optional[str]
+    status: str
+    updated: int
+
+
+Listener = Callable[[StatusChange], None]
+
+
+def detect_changes(subscription: Subscription,
+                   homeworks: Iterable[dict]) -> List[StatusChange]:
+    """Comparing homeworks with the known state and recording them.
+
+    Only (id, status, date_updated) tuples are compared, so nothing is
+    rendered for homeworks that did not move. The state is left untouched
+    when any homework of the answer is invalid.
+    """
+    checked = []
+    for homework in homeworks:
+        if 'homework_name' not in homework:
+            raise KeyError('Missing key "homework_name"')
+        if 'status' not in homework:
+            raise KeyError('Missing key "status"')
+        checked.append((homework_key(homework), homework,
+                        encode_status(homework['status']),
+                        parse_date(homework.get('date_updated'))))
+    # Nothing is recorded until the whole answer is valid, otherwise the
+    # changes before a broken homework would be lost on the next poll.
+    changes = []
+    for homework_id, homework, status, updated in checked:
+        known = subscription.get(homework_id)
+        if known is not None and (known.status, known.updated) == (
+                status, updated):
+            continue
+        subscription.set(homework_id, homework['homework_name'],
+                         status, updated)
+        changes.append(StatusChange(
+            subscription.chat_id,
+            homework_id,
+            homework['homework_name'],
+            None if known is None else decode_status(known.status),
+            homework['status'],
+            updated,
+        ))
+    return changes
+
+
+class ChangeStream:
+    """Fan-out of status changes to subscribed listeners."""
+
+    __slots__ = ('_listeners',)
+
+    def __init__(self) -> None:
+        self._listeners = []
+
+    def subscribe(self, listener: Listener) -> Callable[[], None]:
+        """Adding a listener, returns a function removing it."""
+        self._listeners.append(listener)
+        return lambda: self._listeners.remove(listener)
+
+    def publish(self, change: StatusChange) -> None:
+        """Passing a change to every listener."""
+        for listener in tuple(self._listeners):
+            listener(change)
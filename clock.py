@@ -0,0 +1,65 @@
+"""Clocks of the polling loop.
+
+Code that schedules work asks a clock for the time and sleeps through it
+instead of calling the time module. SystemClock is the real time;
+VirtualClock stands in for it in tests and benchmarks: a sleep returns at
+once and moves the clock forward, so weeks of polling can be simulated in
+minutes.
+"""
+import threading
+import time as _time
+from typing import Callable, Optional
+
+
+class SystemClock:
+    """Real time of the time module, looked up on every call."""
+
+    def time(self) -> float:
+        """Current unix time."""
+        return _time.time()
+
+    def monotonic(self) -> float:
+        """Current time for measuring intervals."""
+        return _time.monotonic()
+
+    def sleep(self, seconds: float) -> None:
+        """Waiting for a number of seconds."""
+        _time.sleep(seconds)
+
+
+class VirtualClock:
+    """Time that only moves when someone sleeps."""
+
+    def __init__(self, start: float = 1_600_000_000.0,
+                 on_sleep: Optional[Callable[[float], None]] = None) -> None:
+        self.start = start
+        self.on_sleep = on_sleep
+        self._now = start
+        self._lock = threading.Lock()
+
+    @property
+    def elapsed(self) -> float:
+        """Virtual seconds since the start."""
+        return self._now - self.start
+
+    def time(self) -> float:
+        """Current virtual unix time."""
+        return self._now
+
+    def monotonic(self) -> float:
+        """Current virtual time for measuring intervals."""
+        return self._now
+
+    def advance(self, seconds: float) -> None:
+        """Moving the clock forward."""
+        with self._lock:
+            self._now += seconds
+
+    def sleep(self, seconds: float) -> None:
+        """Moving the clock forward instead of waiting."""
+        self.advance(seconds)
+        if self.on_sleep is not None:
+            self.on_sleep(seconds)
+
+
+system_clock = SystemClock()
@@ -0,0 +1,117 @@
+"""Settings that can be changed without restarting the bot.
+
+Settings come from the environment (and .env) at start. A file in the
+.env format named by HOMEWORK_CONFIG overrides them and is watched: the
+loop checks its modification time between rounds and switches to the new
+settings all at once, so a round never mixes old and new values.
+"""
+import logging
+import os
+from typing import Mapping, NamedTuple, Optional
+
+from dotenv import dotenv_values
+
+from state import STATUSES
+
+logger = logging.getLogger(__name__)
+
+VERDICT_PREFIX = 'HOMEWORK_VERDICT_'
+
+
+class Settings(NamedTuple):
+    """Reloadable settings of the bot."""
+
+    retry_period: int
+    endpoint: str
+    verdicts: dict
+    practicum_token: Optional[str]
+    telegram_token: Optional[str]
+    telegram_chat_id: Optional[str]
+
+
+def parse_verdicts(values: Mapping[str, Optional[str]],
+                   verdicts: dict) -> dict:
+    """Overriding verdicts with HOMEWORK_VERDICT_<STATUS> values.
+
+    Statuses are stored as codes, so only known ones can be worded.
+    """
+    verdicts = dict(verdicts)
+    for key, value in values.items():
+        if key.startswith(VERDICT_PREFIX) and value:
+            status = key[len(VERDICT_PREFIX):].lower()
+            if status not in STATUSES:
+                raise ValueError(f'{key}: unknown status {status}')
+            verdicts[status] = value
+    return verdicts
+
+
+def parse(values: Mapping[str, Optional[str]], current: Settings) -> Settings:
+    """Overriding current settings with values of a file.
+
+    Keys are RETRY_PERIOD, HOMEWORK_ENDPOINT, PRACTICUM_TOKEN,
+    TELEGRAM_TOKEN, TELEGRAM_CHAT_ID and HOMEWORK_VERDICT_<STATUS> of a
+    known status. Raises ValueError on invalid values.
+    """
+    settings = current
+    if values.get('RETRY_PERIOD'):
+        retry_period = int(values['RETRY_PERIOD'])
+        if retry_period <= 0:
+            raise ValueError('RETRY_PERIOD must be positive')
+        settings = settings._replace(retry_period=retry_period)
+    endpoint = values.get('HOMEWORK_ENDPOINT')
+    if endpoint:
+        if not endpoint.startswith(('http://', 'https://')):
+            raise ValueError(f'HOMEWORK_ENDPOINT is not a URL: {endpoint}')
+        settings = settings._replace(endpoint=endpoint)
+    verdicts = parse_verdicts(values, current.verdicts)
+    if verdicts != current.verdicts:
+        settings = settings._replace(verdicts=verdicts)
+    for field, key in (('practicum_token', 'PRACTICUM_TOKEN'),
+                       ('telegram_token', 'TELEGRAM_TOKEN'),
+                       ('telegram_chat_id', 'TELEGRAM_CHAT_ID')):
+        if values.get(key):
+            settings = settings._replace(**{field: values[key]})
+    return settings
+
+
+class ConfigWatcher:
+    """Reloads a settings file when its modification time changes.
+
+    The settings of the first poll are the baseline: every change of the
+    file is applied to them, so a line removed from the file goes back to
+    its value from the environment, and so do all when the file is
+    removed. Without a path there is nothing to watch and poll returns
+    None.
+    """
+
+    def __init__(self, path: Optional[str]) -> None:
+        self.path = path
+        self.baseline = None
+        self._version = None
+
+    def _stat(self) -> Optional[tuple]:
+        if not self.path:
+            return None
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def poll(self, current: Settings) -> Optional[Settings]:
+        """New settings if the file changed since the last poll."""
+        if self.baseline is None:
+            self.baseline = current
+        version = self._stat()
+        if version == self._version:
+            return None
+        self._version = version
+        if version is None:
+            settings = self.baseline
+        else:
+            try:
+                settings = parse(dotenv_values(self.path), self.baseline)
+            except (OSError, ValueError) as error:
+                logger.error(f'Settings of {self.path} ignored: {error}')
+                return None
+        return None if settings == current else settings
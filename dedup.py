@@ -0,0 +1,83 @@
+"""Idempotency of notifications.
+
+Every delivered change is remembered by a 64-bit key of (chat_id,
+homework id, status, date_updated) for a time to live, so a retried or
+replayed poll never notifies twice. Keys live in an OrderedDict ordered
+by expiry: lookups are O(1) and expired or excess keys are popped from
+its front, also O(1). Persisted keys are looked up one at a time, so a
+run never loads all of them.
+"""
+import hashlib
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from changes import StatusChange
+from clock import system_clock
+
+DAY = 24 * 3600
+
+
+def delivery_key(change: StatusChange) -> int:
+    """Stable signed 64-bit key of a notification."""
+    digest = hashlib.blake2b(
+        f'{change.chat_id}\0{change.homework_id}\0{change.status}\0'
+        f'{change.updated}'.encode(), digest_size=8
+    ).digest()
+    return int.from_bytes(digest, 'big', signed=True)
+
+
+class DedupStore:
+    """Keys of delivered notifications with TTL and size bounds.
+
+    A key seen again is refreshed: it moves to the end and gets a new
+    expiry, so with one TTL the keys stay ordered by expiry. on_add is
+    called with (key, expires) of every added key; lookup(key, now) is
+    asked about keys missing in memory, a key found there is added again.
+    """
+
+    def __init__(self, ttl: float = 7 * DAY, maxsize: int = 1_000_000,
+                 clock=system_clock,
+                 on_add: Optional[Callable[[int, float], None]] = None,
+                 lookup: Optional[Callable[[int, float], bool]] = None
+                 ) -> None:
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.clock = clock
+        self.on_add = on_add
+        self.lookup = lookup
+        self.evicted = 0
+        self._expires = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._expires)
+
+    def _evict(self, now: float) -> None:
+        expires = self._expires
+        while expires:
+            key = next(iter(expires))
+            if expires[key] > now and len(expires) <= self.maxsize:
+                return
+            expires.popitem(last=False)
+            self.evicted += 1
+
+    def __contains__(self, key: int) -> bool:
+        now = self.clock.time()
+        self._evict(now)
+        if key not in self._expires:
+            if self.lookup is None or not self.lookup(key, now):
+                return False
+            self.add(key)
+            return True
+        self._expires[key] = now + self.ttl
+        self._expires.move_to_end(key)
+        return True
+
+    def add(self, key: int) -> None:
+        """Remembering a delivered notification."""
+        now = self.clock.time()
+        expires = now + self.ttl
+        self._expires[key] = expires
+        self._expires.move_to_end(key)
+        self._evict(now)
+        if self.on_add is not None:
+            self.on_add(key, expires)
@@ -0,0 +1,97 @@
+"""Grouping of repeated errors into periodic digests.
+
+Errors are grouped by fingerprint, their message with numbers masked, per
+chat over a time window. The first error of a kind can be reported at
+once; repeats only increase a count and are sent as one digest when the
+window ends.
+"""
+import re
+import time
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+
+_NUMBERS = re.compile(r'\d+')
+
+OTHER = 'other errors'
+
+
+def fingerprint(error: BaseException) -> str:
+    """Kind of an error, the same for errors differing only in numbers."""
+    return f'{type(error).__name__}: {_NUMBERS.sub("N", str(error))}'
+
+
+class _Window:
+    """Errors of one chat since the window started."""
+
+    __slots__ = ('started', 'errors')
+
+    def __init__(self, started: float) -> None:
+        self.started = started
+        # fingerprint -> [count, reported, last message]
+        self.errors: Dict[str, list] = {}
+
+
+class ErrorDigest:
+    """Folds repeated errors of every chat into counts.
+
+    With immediate, record tells to report the first error of a kind
+    right away and the digest only lists repeats. At most max_kinds
+    fingerprints are kept per window, the rest are counted together.
+    """
+
+    def __init__(self, window: float = 3600.0, immediate: bool = True,
+                 max_kinds: int = 20,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        self.window = window
+        self.immediate = immediate
+        self.max_kinds = max_kinds
+        self.clock = clock
+        self._windows: Dict[Hashable, _Window] = {}
+
+    def __len__(self) -> int:
+        return len(self._windows)
+
+    def record(self, chat_id: Hashable, error: BaseException,
+               message: Optional[str] = None) -> bool:
+        """Counting an error, True if it has to be reported now."""
+        window = self._windows.get(chat_id)
+        if window is None:
+            window = self._windows[chat_id] = _Window(self.clock())
+        kind = fingerprint(error)
+        message = message or f'{type(error).__name__}: {error}'
+        if kind not in window.errors and len(window.errors) >= self.max_kinds:
+            kind = OTHER
+            message = f'{OTHER}, the last: {message}'
+        entry = window.errors.get(kind)
+        if entry is None:
+            report = self.immediate and kind != OTHER
+            window.errors[kind] = [1, int(report), message]
+            return report
+        entry[0] += 1
+        entry[2] = message
+        return False
+
+    def flush(self, force: bool = False) -> List[Tuple[Hashable, str]]:
+        """Digests of chats whose window ended, or of all chats.
+
+        Kinds that keep repeating stay known in the next window, so an
+        error lasting for hours comes as one digest per window.
+        """
+        now = self.clock()
+        digests = []
+        for chat_id, window in list(self._windows.items()):
+            if not force and now - window.started < self.window:
+                continue
+            del self._windows[chat_id]
+            lines = [
+                f'{count - reported} × {message}'
+                for count, reported, message in window.errors.values()
+                if count > reported
+            ]
+            if not lines:
+                continue
+            digests.append((chat_id, '\n'.join(['Error digest:', *lines])))
+            known = self._windows[chat_id] = _Window(now)
+            known.errors = {
+                kind: [0, 0, entry[2]] for kind, entry in window.errors.items()
+            }
+        return digests
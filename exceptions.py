@@ -4,3 +4,7 @@ class EasyException(Exception):
 
 class HardException(Exception):
     """Требует отправки в телеграм."""
+
+
+class DeliveryError(HardException):
+    """Сообщение не доставлено."""
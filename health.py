@@ -0,0 +1,157 @@
+"""Liveness and readiness of the polling loop over HTTP.
+
+The loop beats before every round and before every sleep, saying when it
+will beat again. The server runs on its own thread, so it keeps answering
+when the loop hangs and reports it as dead once the deadline passes:
+
+    GET /livez   200 while the loop beats in time, 503 otherwise
+    GET /readyz  200 while alive, once polled and no circuit is open
+    GET /health  the full state as JSON
+
+A circuit of a dependency (Practicum, Telegram) opens after a number of
+consecutive failures and closes on the next success.
+"""
+import json
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional
+
+from clock import system_clock
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+
+
+class Circuit:
+    """Failure streak of one dependency."""
+
+    __slots__ = ('failures', 'last_error', 'last_success')
+
+    def __init__(self) -> None:
+        self.failures = 0
+        self.last_error = None
+        self.last_success = None
+
+
+class Health:
+    """State of the loop shared with the health server."""
+
+    def __init__(self, clock=system_clock, threshold: int = 3) -> None:
+        self.clock = clock
+        self.threshold = threshold
+        self.deadline = None
+        self.depths: Callable[[], Dict[str, int]] = dict
+        self.circuits: Dict[str, Circuit] = {}
+        self._server = None
+
+    def beat(self, within: float) -> None:
+        """Telling the loop is alive and will beat again within seconds."""
+        self.deadline = self.clock.time() + within
+
+    def _circuit(self, name: str) -> Circuit:
+        circuit = self.circuits.get(name)
+        if circuit is None:
+            circuit = self.circuits.setdefault(name, Circuit())
+        return circuit
+
+    def success(self, name: str) -> None:
+        """Recording a successful call of a dependency."""
+        circuit = self._circuit(name)
+        circuit.failures = 0
+        circuit.last_success = self.clock.time()
+
+    def failure(self, name: str, error: Exception) -> None:
+        """Recording a failed call of a dependency."""
+        circuit = self._circuit(name)
+        circuit.failures += 1
+        circuit.last_error = f'{type(error).__name__}: {error}'
+
+    def state(self, name: str) -> str:
+        """Whether the circuit of a dependency is open."""
+        circuit = self.circuits.get(name)
+        if circuit is not None and circuit.failures >= self.threshold:
+            return OPEN
+        return CLOSED
+
+    def last_success(self, name: str) -> Optional[float]:
+        """Time of the last successful call of a dependency."""
+        circuit = self.circuits.get(name)
+        return circuit.last_success if circuit else None
+
+    @property
+    def live(self) -> bool:
+        """Whether the loop beat in time."""
+        return self.deadline is not None and self.clock.time() <= self.deadline
+
+    @property
+    def ready(self) -> bool:
+        """Whether the bot is alive, has polled and no circuit is open."""
+        return (self.live and self.last_success('practicum') is not None
+                and all(self.state(name) == CLOSED for name in self.circuits))
+
+    def snapshot(self) -> dict:
+        """State of the loop as plain data."""
+        return {
+            'live': self.live,
+            'ready': self.ready,
+            'now': self.clock.time(),
+            'deadline': self.deadline,
+            'last_poll': self.last_success('practicum'),
+            'last_send': self.last_success('telegram'),
+            'queues': self.depths(),
+            'circuits': {
+                name: {'state': self.state(name),
+                       'failures': circuit.failures,
+                       'last_error': circuit.last_error}
+                for name, circuit in list(self.circuits.items())
+            },
+        }
+
+    def serve(self, port: int, host: str = '') -> int:
+        """Starting the health server on a thread, returning its port."""
+        health = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def do_GET(self) -> None:
+                """Answering a health check."""
+                path = self.path.split('?')[0]
+                if path not in ('/livez', '/readyz', '/health'):
+                    self.send_error(404)
+                    return
+                try:
+                    snapshot = health.snapshot()
+                except Exception as error:
+                    logger.error(f'Health check failed: {error}')
+                    self.send_error(500)
+                    return
+                ok = {'/livez': snapshot['live'],
+                      '/readyz': snapshot['ready']}.get(path, True)
+                body = json.dumps(snapshot).encode()
+                self.send_response(200 if ok else 503)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args) -> None:
+                """Keeping checks out of the log."""
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(
+            target=self._server.serve_forever, name='health', daemon=True
+        ).start()
+        port = self._server.server_port
+        logger.info(f'Health checks on port {port}')
+        return port
+
+    def close(self) -> None:
+        """Stopping the health server."""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
@@ -1,24 +1,57 @@
+"""Telegram bot tracking homework review statuses on Yandex.Practicum."""
+import argparse
 import logging
 import os
+import sqlite3
 import sys
 import time
 from http import HTTPStatus
 
-import requests
-import telegram
 from dotenv import load_dotenv
 
+import transport
+from changes import ChangeStream, StatusChange, detect_changes
+from clock import system_clock
+from config import ConfigWatcher, Settings
+from dedup import DedupStore
+from digest import ErrorDigest
 from exceptions import EasyException, HardException
+from health import Health
+from lazy import lazy_import
+from metrics import registry
+from profiling import Profiler
+from sinks import Pipeline, TelegramSink, build_sinks
+from state import Subscription
+from storage import Storage
+from streaming import HomeworkStream
+from tracing import exporters_from_env, tracer
+
+requests = lazy_import('requests')
+telegram = lazy_import('telegram')
 
 load_dotenv()
 
 PRACTICUM_TOKEN = os.getenv('PRACTICUM_TOKEN')
 TELEGRAM_TOKEN = os.getenv('TELEGRAM_TOKEN')
 TELEGRAM_CHAT_ID = os.getenv('TELEGRAM_CHAT_ID')
+OPERATOR_CHAT_ID = os.getenv('OPERATOR_CHAT_ID')
+ERROR_DIGEST_WINDOW = int(os.getenv('ERROR_DIGEST_WINDOW', 3600))
+NOTIFY_SINKS = os.getenv('NOTIFY_SINKS', '')
+STATE_FILE = os.getenv('STATE_FILE', '')
+DEFAULT_STATE_FILE = 'state.sqlite3'
+METRICS_FILE = os.getenv('METRICS_FILE', '')
+CONFIG_FILE = os.getenv('HOMEWORK_CONFIG')
+DEDUP_TTL = int(os.getenv('DEDUP_TTL', 7 * 24 * 3600))
+DEDUP_SIZE = int(os.getenv('DEDUP_SIZE', 1_000_000))
+HEALTH_PORT = int(os.getenv('HEALTH_PORT', 0))
+HEALTH_GRACE = 120
 
 RETRY_PERIOD: int = 600
 ENDPOINT = 'https://practicum.yandex.ru/api/user_api/homework_statuses/'
 HEADERS = {'Authorization': f'OAuth {PRACTICUM_TOKEN}'}
+STREAM_CHUNK_SIZE = 16384
+HEDGE_REQUESTS = bool(os.getenv('HOMEWORK_HEDGE'))
+HOMEWORK_FIELDS = ('id', 'homework_name', 'status', 'date_updated')
 
 HOMEWORK_VERDICTS = {
     'approved': 'The work is checked: the reviewer liked everything. Hooray!',
@@ -27,27 +60,99 @@ HOMEWORK_VERDICTS = {
 }
 
 logger = logging.getLogger(__name__)
+profiler = Profiler.from_env()
+# Clock of the polling loop, replaced by a VirtualClock in simulations.
+runtime = system_clock
+health = Health()
 
 
-def send_message(bot, message: str) -> None:
-    """Sending a message."""
+def send_to_chat(bot, chat_id, message: str) -> bool:
+    """Sending a message to a chat."""
     try:
         logger.info('Attempt to send a message')
-        bot.send_message(TELEGRAM_CHAT_ID, message)
-    except telegram.error.TelegramError:
+        with profiler.stage('send_message'), tracer.span('send_message'):
+            bot.send_message(chat_id, message)
+    except telegram.error.TelegramError as error:
         logger.error(f'Message not sent: "{message}"')
-    else:
-        logger.debug('Message sent')
+        health.failure('telegram', error)
+        return False
+    logger.debug('Message sent')
+    health.success('telegram')
+    return True
+
+
+def send_message(bot, message: str) -> bool:
+    """Sending a message."""
+    return send_to_chat(bot, TELEGRAM_CHAT_ID, message)
+
+
+def auth_headers(token: str) -> dict:
+    """Building the authorization headers for a Practicum token."""
+    return {'Authorization': f'OAuth {token}'}
 
 
 def get_api_answer(current_timestamp: int) -> dict:
     """Getting an api response from the Workshop."""
+    return request_api(current_timestamp, HEADERS)
+
+
+def request_api(current_timestamp: int, headers: dict) -> dict:
+    """Getting an api response with the given headers."""
+    response = open_api(current_timestamp, headers)
+    started = time.perf_counter()
+    try:
+        answer = response.json()
+    except ValueError:
+        raise HardException('The server sent invalid json')
+    transport.record_transfer(
+        'poll', response, len(getattr(response, 'content', b'')),
+        time.perf_counter() - started
+    )
+    return slim_answer(answer)
+
+
+def slim_answer(answer):
+    """Dropping the homework fields the bot does not use."""
+    if isinstance(answer, dict) and isinstance(answer.get('homeworks'), list):
+        answer['homeworks'] = [
+            {key: homework[key] for key in HOMEWORK_FIELDS if key in homework}
+            if isinstance(homework, dict) else homework
+            for homework in answer['homeworks']
+        ]
+    return answer
+
+
+def stream_api(current_timestamp: int, headers: dict) -> HomeworkStream:
+    """Getting homeworks of an api response parsed as they arrive."""
+    response = open_api(current_timestamp, headers, stream=True)
+    started = time.perf_counter()
+
+    def close():
+        response.close()
+        transport.record_transfer(
+            'stream', response, homeworks.bytes_read,
+            time.perf_counter() - started
+        )
+
+    homeworks = HomeworkStream(
+        response.iter_content(chunk_size=STREAM_CHUNK_SIZE), close,
+        keep=HOMEWORK_FIELDS
+    )
+    return homeworks
+
+
+def open_api(current_timestamp: int, headers: dict,
+             stream: bool = False):
+    """Sending a request to the api and checking its status."""
     timestamp = current_timestamp
     params = {'from_date': timestamp}
     try:
-        response = requests.get(ENDPOINT, headers=HEADERS, params=params)
+        response = transport.get(
+            requests.get, ENDPOINT, hedge=HEDGE_REQUESTS,
+            headers=headers, params=params, stream=stream
+        )
         if response.status_code == HTTPStatus.OK:
-            return response.json()
+            return response
         else:
             check_status_code = response.status_code
             check_reason = response.reason
@@ -100,17 +205,140 @@ def parse_status(homework: dict) -> str:
     return f'Job verification status changed "{homework_name}". {verdict}'
 
 
+def render_change(change: StatusChange) -> str:
+    """Rendering a status change into a message."""
+    with profiler.stage('parse_status'), tracer.span('parse_status'):
+        return parse_status(
+            {'homework_name': change.homework_name, 'status': change.status}
+        )
+
+
+def build_pipeline(bot, send=send_to_chat, on_failure=None,
+                   dedup: DedupStore = None) -> Pipeline:
+    """Building the delivery pipeline of status changes."""
+    pipeline = Pipeline(build_sinks(NOTIFY_SINKS, clock=runtime))
+    pipeline.add(TelegramSink(bot, render_change, send, dedup=dedup,
+                              on_failure=on_failure, clock=runtime))
+    return pipeline
+
+
+def report_metrics(pipeline: Pipeline) -> None:
+    """Updating sink gauges and writing metrics for the admin CLI."""
+    for sink in pipeline.sinks:
+        registry.gauge(f'queue.{sink.name}', sink.depth)
+        registry.gauge(f'sink.{sink.name}.delivered', sink.delivered)
+        registry.gauge(f'sink.{sink.name}.dropped', sink.dropped)
+        registry.gauge(f'sink.{sink.name}.failed', sink.failed)
+    if not METRICS_FILE:
+        return
+    try:
+        registry.dump(METRICS_FILE)
+    except OSError as error:
+        logger.error(f'Metrics not saved: {error}')
+
+
 def check_tokens() -> bool:
     """Checking tokens."""
     return all((PRACTICUM_TOKEN, TELEGRAM_TOKEN, TELEGRAM_CHAT_ID))
 
 
+def current_settings() -> Settings:
+    """Settings the bot runs with."""
+    return Settings(RETRY_PERIOD, ENDPOINT, HOMEWORK_VERDICTS,
+                    PRACTICUM_TOKEN, TELEGRAM_TOKEN, TELEGRAM_CHAT_ID)
+
+
+def apply_settings(settings: Settings) -> None:
+    """Switching to new settings between polling rounds."""
+    global RETRY_PERIOD, ENDPOINT, HOMEWORK_VERDICTS, HEADERS
+    global PRACTICUM_TOKEN, TELEGRAM_TOKEN, TELEGRAM_CHAT_ID
+    RETRY_PERIOD = settings.retry_period
+    ENDPOINT = settings.endpoint
+    HOMEWORK_VERDICTS = settings.verdicts
+    PRACTICUM_TOKEN = settings.practicum_token
+    TELEGRAM_TOKEN = settings.telegram_token
+    TELEGRAM_CHAT_ID = settings.telegram_chat_id
+    HEADERS = auth_headers(PRACTICUM_TOKEN)
+    logger.info(f'Settings reloaded, polling every {RETRY_PERIOD} s')
+
+
+def reload_settings(watcher: ConfigWatcher,
+                    subscription: Subscription = None) -> None:
+    """Applying the settings file if it changed.
+
+    A running subscription follows the new token and chat; the bot keeps
+    its token until a restart.
+    """
+    settings = watcher.poll(current_settings())
+    if settings is None:
+        return
+    if subscription is not None:
+        if settings.telegram_token != TELEGRAM_TOKEN:
+            logger.warning('The new TELEGRAM_TOKEN is used after a restart')
+        subscription.token = settings.practicum_token
+        subscription.chat_id = settings.telegram_chat_id
+    apply_settings(settings)
+
+
+def report_error(bot, errors: ErrorDigest, chat_id, error: Exception) -> None:
+    """Sending the first error of a kind at once, repeats in a digest."""
+    message = f'Program crash: {error}'
+    chat_id = OPERATOR_CHAT_ID or chat_id
+    if errors.record(chat_id, error, message):
+        send_to_chat(bot, chat_id, message)
+
+
+def send_digests(bot, errors: ErrorDigest, force: bool = False) -> None:
+    """Sending digests of the error windows that ended."""
+    for chat_id, digest in errors.flush(force):
+        send_to_chat(bot, chat_id, digest)
+
+
+def start_health(pipeline: Pipeline) -> None:
+    """Exposing the state of the loop on HEALTH_PORT, if set."""
+    health.clock = runtime
+    health.depths = pipeline.depths
+    if HEALTH_PORT:
+        health.serve(HEALTH_PORT)
+
+
+def save_state(storage: Storage, subscription: Subscription) -> None:
+    """Writing the state of the loop, forgetting expired deliveries."""
+    subscription.next_due = runtime.time() + RETRY_PERIOD
+    try:
+        storage.save([subscription])
+        storage.expire_deliveries(runtime.time())
+    except sqlite3.Error as error:
+        logger.error(f'State not saved: {error}')
+
+
+def poll(subscription: Subscription, stream: ChangeStream) -> None:
+    """Polling the API once and publishing status changes."""
+    with tracer.span('poll', chat_id=str(subscription.chat_id)):
+        with profiler.stage('get_api_answer'), tracer.span('get_api_answer'):
+            response = request_api(subscription.cursor,
+                                   auth_headers(subscription.token))
+        with profiler.stage('check_response'), tracer.span('check_response'):
+            homeworks = check_response(response)
+        with profiler.stage('detect_changes'), tracer.span('detect_changes'):
+            changes = detect_changes(subscription, homeworks)
+        if not changes:
+            logger.debug('Status has not changed')
+        for change in changes:
+            logger.info('Check status changed')
+            stream.publish(change)
+        subscription.cursor = response['current_date']
+
+
 def main() -> None:
     """The main logic of the bot."""
-    bot = telegram.Bot(token=TELEGRAM_TOKEN)
-    current_timestamp = int(time.time())
-    old_status_message = ''
-    old_error_message = ''
+    watcher = ConfigWatcher(CONFIG_FILE)
+    reload_settings(watcher)
+    subscription = Subscription(
+        TELEGRAM_CHAT_ID, PRACTICUM_TOKEN, int(runtime.time())
+    )
+    stream = ChangeStream()
+    errors = ErrorDigest(ERROR_DIGEST_WINDOW, clock=runtime.monotonic)
 
     logging.basicConfig(
         format='%(asctime)s | %(levelname)s | %(message)s',
@@ -123,35 +351,153 @@ def main() -> None:
     if check_tokens() is False:
         logger.critical('Missing required environment variable')
         sys.exit('Fill in all environment variables')
-    while True:
-        logger.info('All tokens are in place')
-        try:
-            response = get_api_answer(current_timestamp)
-            homework = check_response(response)
-            if not homework:
-                logger.debug('Status has not changed')
-            else:
-                status_message = parse_status(homework[0])
-                if status_message != old_status_message:
-                    logger.info('Check status changed')
-                    send_message(bot, status_message)
-                    old_status_message = status_message
-
-            current_timestamp = response.get('current_timestamp')
-
-        except EasyException as error:
-            logger.error(f'Regular deviation from the scenario: {error}')
-
-        except Exception as error:
-            error_message = f'Program crash: {error}'
-            logger.error(error, exc_info=error)
-            if error_message != old_error_message:
-                send_message(bot, error_message)
-                old_error_message = error_message
-
-        finally:
-            time.sleep(RETRY_PERIOD)
+    bot = telegram.Bot(token=TELEGRAM_TOKEN)
+    # Without STATE_FILE the state of the loop is only kept in memory.
+    storage = Storage(STATE_FILE or ':memory:', runtime)
+    pipeline = build_pipeline(
+        bot, lambda bot, chat_id, message: send_message(bot, message),
+        on_failure=storage.record_failure,
+        dedup=DedupStore(DEDUP_TTL, DEDUP_SIZE, runtime,
+                         on_add=storage.record_delivery,
+                         lookup=storage.has_delivery),
+    )
+    pipeline.attach(stream)
+    profiler.install_signal()
+    tracer.configure(exporters_from_env())
+    start_health(pipeline)
+    try:
+        while True:
+            logger.info('All tokens are in place')
+            health.beat(HEALTH_GRACE)
+            reload_settings(watcher, subscription)
+            # Profiled rounds also cover the sends of their changes.
+            pipeline.deliver_inline(profiler.active)
+            try:
+                with profiler.round():
+                    poll(subscription, stream)
+                health.success('practicum')
+
+            except EasyException as error:
+                logger.error(f'Regular deviation from the scenario: {error}')
+                health.failure('practicum', error)
+
+            except Exception as error:
+                logger.error(error, exc_info=error)
+                health.failure('practicum', error)
+                report_error(bot, errors, TELEGRAM_CHAT_ID, error)
+
+            finally:
+                send_digests(bot, errors)
+                save_state(storage, subscription)
+                report_metrics(pipeline)
+                health.beat(RETRY_PERIOD + HEALTH_GRACE)
+                runtime.sleep(RETRY_PERIOD)
+    finally:
+        send_digests(bot, errors, force=True)
+        pipeline.close()
+        storage.close()
+        tracer.close()
+        health.close()
+
+
+def deliver_changes(storage: Storage, changes: list,
+                    errors: ErrorDigest) -> None:
+    """Sending changes of a run and its error digest to the operator."""
+    bot = telegram.Bot(token=TELEGRAM_TOKEN)
+    storage.expire_deliveries(runtime.time())
+    dedup = DedupStore(DEDUP_TTL, DEDUP_SIZE, runtime,
+                       on_add=storage.record_delivery,
+                       lookup=storage.has_delivery)
+    pipeline = build_pipeline(bot, on_failure=storage.record_failure,
+                              dedup=dedup)
+    # Nothing waits on a run, so changes are sent inline, never dropped.
+    pipeline.deliver_inline(True)
+    for change in changes:
+        pipeline.publish(change)
+    pipeline.close()
+    report_metrics(pipeline)
+    if OPERATOR_CHAT_ID:
+        send_digests(bot, errors, force=True)
+
+
+def run_once(storage: Storage, subscriptions: list) -> int:
+    """Polling subscriptions once, delivering changes and saving state.
+
+    The bot is only built when there is something to send. Errors go to
+    OPERATOR_CHAT_ID, if set, as one digest of the run.
+    """
+    changes = []
+    stream = ChangeStream()
+    stream.subscribe(changes.append)
+    errors = ErrorDigest(immediate=False)
+    now = runtime.time()
+    # The run is one round, so a profile covers the sends of its changes.
+    with profiler.round():
+        for subscription in subscriptions:
+            try:
+                poll(subscription, stream)
+            except Exception as error:
+                logger.error(
+                    f'Poll of chat {subscription.chat_id} failed: {error}'
+                )
+                errors.record(OPERATOR_CHAT_ID, error)
+            subscription.next_due = now + RETRY_PERIOD
+        if changes or (OPERATOR_CHAT_ID and errors):
+            deliver_changes(storage, changes, errors)
+    storage.save(subscriptions)
+    return len(changes)
+
+
+def read_tokens(path: str) -> list:
+    """Reading "chat_id token" pairs, one per line."""
+    with open(path, encoding='utf-8') as file:
+        return [
+            tuple(line.split()[:2]) for line in file
+            if line.strip() and not line.startswith('#')
+        ]
+
+
+def cli(argv=None) -> None:
+    """Running the bot from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--once', action='store_true',
+                      help='poll the configured chat once and exit')
+    mode.add_argument('--batch', action='store_true',
+                      help='poll every due subscription once and exit')
+    parser.add_argument('--tokens', metavar='FILE',
+                        help='subscribe "chat_id token" pairs before a batch')
+    parser.add_argument('--state', default=STATE_FILE or DEFAULT_STATE_FILE,
+                        help='state database, default: %(default)s')
+    args = parser.parse_args(argv)
+    if not (args.once or args.batch):
+        main()
+        return
+
+    logging.basicConfig(
+        format='%(asctime)s | %(levelname)s | %(message)s',
+        level=logging.INFO, stream=sys.stdout
+    )
+    reload_settings(ConfigWatcher(CONFIG_FILE))
+    if not TELEGRAM_TOKEN or (args.once and not check_tokens()):
+        logger.critical('Missing required environment variable')
+        sys.exit('Fill in all environment variables')
+    tracer.configure(exporters_from_env())
+    with Storage(args.state, runtime) as storage:
+        if args.once:
+            storage.register(TELEGRAM_CHAT_ID, PRACTICUM_TOKEN,
+                             int(runtime.time()), update_token=True)
+            subscriptions = [storage.load_subscription(TELEGRAM_CHAT_ID)]
+        else:
+            for chat_id, token in read_tokens(args.tokens or os.devnull):
+                storage.register(chat_id, token, int(runtime.time()),
+                                 update_token=True)
+            subscriptions = storage.load_due(runtime.time())
+        sent = run_once(storage, subscriptions)
+    tracer.close()
+    logger.info(f'Polled {len(subscriptions)} subscriptions, '
+                f'{sent} changes delivered')
 
 
 if __name__ == '__main__':
-    main()
+    cli()
@@ -0,0 +1,106 @@
+"""In-process metrics: counters, gauges and timings with percentiles."""
+import json
+import os
+import threading
+from collections import deque
+from typing import Dict, Optional
+
+SAMPLES = 1024
+
+
+def percentile(samples, fraction: float) -> Optional[float]:
+    """Getting a percentile of samples, None when there are none."""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(fraction * len(ordered)))
+    return ordered[index]
+
+
+class Timing:
+    """Count, total and a window of recent samples of one timing."""
+
+    __slots__ = ('count', 'total', 'max', 'samples')
+
+    def __init__(self, size: int = SAMPLES) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples = deque(maxlen=size)
+
+    def add(self, value: float) -> None:
+        """Recording a sample."""
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+        self.samples.append(value)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        """Getting a percentile of recent samples."""
+        return percentile(self.samples, fraction)
+
+    def summary(self) -> dict:
+        """Summarizing the timing."""
+        samples = list(self.samples)
+        return {
+            'count': self.count,
+            'total': self.total,
+            'max': self.max,
+            'p50': percentile(samples, 0.5),
+            'p95': percentile(samples, 0.95),
+            'p99': percentile(samples, 0.99),
+        }
+
+
+class Metrics:
+    """Thread-safe registry of named metrics."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.counters: Dict[str, float] = {}
+        self.gauges: Dict[str, float] = {}
+        self.timings: Dict[str, Timing] = {}
+
+    def increment(self, name: str, value: float = 1) -> None:
+        """Increasing a counter."""
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def gauge(self, name: str, value: float) -> None:
+        """Setting a gauge."""
+        with self._lock:
+            self.gauges[name] = value
+
+    def timing(self, name: str, value: float) -> None:
+        """Recording a timing sample."""
+        with self._lock:
+            timing = self.timings.get(name)
+            if timing is None:
+                timing = self.timings[name] = Timing()
+            timing.add(value)
+
+    def get_timing(self, name: str) -> Optional[Timing]:
+        """Getting a timing by name."""
+        return self.timings.get(name)
+
+    def snapshot(self) -> dict:
+        """Getting all metrics as plain data."""
+        with self._lock:
+            return {
+                'counters': dict(self.counters),
+                'gauges': dict(self.gauges),
+                'timings': {
+                    name: timing.summary()
+                    for name, timing in self.timings.items()
+                },
+            }
+
+    def dump(self, path: str) -> None:
+        """Writing a snapshot to a JSON file atomically."""
+        temporary = f'{path}.tmp'
+        with open(temporary, 'w', encoding='utf-8') as file:
+            json.dump(self.snapshot(), file, indent=2)
+        os.replace(temporary, path)
+
+
+registry = Metrics()
@@ -0,0 +1,187 @@
+"""Opt-in profiling of polling rounds.
+
+Profiling is armed for a number of rounds by HOMEWORK_PROFILE or by
+sending SIGUSR1 to the process. Every armed round is captured with
+cProfile or a sampling profiler and dumped to HOMEWORK_PROFILE_DIR,
+stage timings are dumped when the session ends. While disarmed a round
+and a stage cost one attribute check.
+"""
+import cProfile
+import json
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from typing import Optional
+
+from metrics import Metrics, registry
+
+CPROFILE = 'cprofile'
+SAMPLE = 'sample'
+
+_NULL = nullcontext()
+
+logger = logging.getLogger(__name__)
+
+
+class Sampler:
+    """Sampling profiler collecting stacks of one thread."""
+
+    def __init__(self, thread_id: int, interval: float = 0.005) -> None:
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self) -> None:
+        frame = sys._current_frames().get(self.thread_id)
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f'{code.co_name} ({code.co_filename}:'
+                         f'{frame.f_lineno})')
+            frame = frame.f_back
+        if stack:
+            self.stacks[';'.join(reversed(stack))] += 1
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self) -> None:
+        """Starting sampling."""
+        self._thread = threading.Thread(
+            target=self._run, name='sampler', daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stopping sampling."""
+        self._stop.set()
+        self._thread.join()
+
+    def dump(self, path: str) -> None:
+        """Writing stacks in the collapsed format of flame graph tools."""
+        with open(path, 'w', encoding='utf-8') as file:
+            for stack, count in self.stacks.most_common():
+                file.write(f'{stack} {count}\n')
+
+
+class Profiler:
+    """Captures profiles of polling rounds and times their stages."""
+
+    def __init__(self, directory: str = 'profiles', mode: str = CPROFILE,
+                 metrics: Metrics = registry) -> None:
+        if mode not in (CPROFILE, SAMPLE):
+            raise ValueError(f'Unknown profiling mode: {mode}')
+        self.directory = directory
+        self.mode = mode
+        self.metrics = metrics
+        self.remaining = 0
+        self.stage_timers = False
+        self._round = 0
+
+    @classmethod
+    def from_env(cls) -> 'Profiler':
+        """Configuring a profiler from environment variables.
+
+        Invalid values are logged and leave profiling disarmed.
+        """
+        try:
+            profiler = cls(
+                os.getenv('HOMEWORK_PROFILE_DIR', 'profiles'),
+                os.getenv('HOMEWORK_PROFILE_MODE', CPROFILE),
+            )
+        except ValueError as error:
+            logger.error(f'Profiling disabled: {error}')
+            return cls()
+        profiler.stage_timers = bool(os.getenv('HOMEWORK_STAGE_TIMERS'))
+        try:
+            rounds = int(os.getenv('HOMEWORK_PROFILE', '0') or 0)
+        except ValueError as error:
+            logger.error(f'Profiling disabled: {error}')
+            return profiler
+        if rounds:
+            profiler.arm(rounds)
+        return profiler
+
+    @property
+    def active(self) -> bool:
+        """Whether rounds are being profiled."""
+        return self.remaining > 0
+
+    def arm(self, rounds: int) -> None:
+        """Profiling the next rounds."""
+        logger.info(f'Profiling the next {rounds} rounds')
+        self.remaining = rounds
+
+    def install_signal(self, rounds: int = 5,
+                       signum: Optional[int] = None) -> bool:
+        """Arming the profiler on a signal, SIGUSR1 by default."""
+        signum = signum or getattr(signal, 'SIGUSR1', None)
+        if signum is None:
+            return False
+        signal.signal(signum, lambda *args: self.arm(rounds))
+        return True
+
+    def round(self):
+        """Context of one polling round."""
+        if not self.remaining:
+            return _NULL
+        return self._profile_round()
+
+    @contextmanager
+    def _profile_round(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self._round += 1
+        name = os.path.join(
+            self.directory, f'round-{int(time.time())}-{self._round}'
+        )
+        if self.mode == CPROFILE:
+            capture = cProfile.Profile()
+            capture.enable()
+        else:
+            capture = Sampler(threading.get_ident())
+            capture.start()
+        try:
+            yield
+        finally:
+            if self.mode == CPROFILE:
+                capture.disable()
+                capture.dump_stats(f'{name}.prof')
+            else:
+                capture.stop()
+                capture.dump(f'{name}.stacks')
+            self.remaining -= 1
+            if not self.remaining:
+                self._dump_stages(f'{name}-stages.json')
+
+    def _dump_stages(self, path: str) -> None:
+        timings = self.metrics.snapshot()['timings']
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump({
+                name: summary for name, summary in timings.items()
+                if name.startswith('stage.')
+            }, file, indent=2)
+        logger.info(f'Profiles saved to {self.directory}')
+
+    def stage(self, name: str):
+        """Context timing one stage of a round."""
+        if not (self.remaining or self.stage_timers):
+            return _NULL
+        return self._time_stage(name)
+
+    @contextmanager
+    def _time_stage(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.metrics.timing(
+                f'stage.{name}', time.perf_counter() - started
+            )
@@ -0,0 +1,341 @@
+"""Pluggable consumers of status change events.
+
+Every sink owns a bounded queue drained by its own thread, so a slow sink
+only fills its queue and never stalls polling. When the queue is full the
+sink applies its backpressure policy, dropped changes go to on_failure
+like failed deliveries. Queued changes carry the span they
+were published in, so queue waits and deliveries join the polling trace.
+"""
+import json
+import logging
+import queue
+import sys
+import threading
+import time
+from typing import Callable, Iterable, List, Optional, TextIO
+
+from changes import ChangeStream, StatusChange
+from clock import system_clock
+from dedup import DedupStore, delivery_key
+from exceptions import DeliveryError
+from lazy import lazy_import
+from metrics import registry
+from tracing import tracer
+
+requests = lazy_import('requests')
+
+BLOCK = 'block'
+DROP_NEW = 'drop_new'
+DROP_OLDEST = 'drop_oldest'
+POLICIES = (BLOCK, DROP_NEW, DROP_OLDEST)
+
+_STOP = object()
+
+logger = logging.getLogger(__name__)
+
+
+class Sink:
+    """Base sink: queues changes and delivers them on a worker thread.
+
+    With maxsize=0, or while inline is set, changes are delivered by the
+    publisher itself. End-to-end latency is measured on clock.
+    """
+
+    name = 'sink'
+
+    def __init__(self, maxsize: int = 100, policy: str = DROP_OLDEST,
+                 block_timeout: float = 1.0,
+                 on_failure: Optional[Callable] = None,
+                 clock=system_clock) -> None:
+        if policy not in POLICIES:
+            raise ValueError(f'Unknown backpressure policy: {policy}')
+        self.maxsize = maxsize
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.delivered = 0
+        self.dropped = 0
+        self.failed = 0
+        self.on_failure = on_failure
+        self.clock = clock
+        self.inline = False
+        self._queue = queue.Queue(maxsize) if maxsize else None
+        self._thread = None
+
+    @property
+    def depth(self) -> int:
+        """Number of changes waiting for delivery."""
+        return self._queue.qsize() if self._queue else 0
+
+    def deliver(self, change: StatusChange) -> Optional[bool]:
+        """Delivering one change, False if it was skipped on purpose."""
+        raise NotImplementedError
+
+    def offer(self, change: StatusChange) -> bool:
+        """Queueing a change according to the backpressure policy."""
+        item = (change, time.time_ns(), tracer.current())
+        if self._queue is None or self.inline:
+            self._deliver(*item)
+            return True
+        try:
+            if self.policy == BLOCK:
+                self._queue.put(item, timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait(item)
+            return True
+        except queue.Full:
+            if self.policy == DROP_OLDEST:
+                return self._replace_oldest(item)
+        self._drop(change)
+        logger.warning(f'Sink {self.name} is full, change dropped')
+        return False
+
+    def _replace_oldest(self, item: tuple) -> bool:
+        try:
+            oldest = self._queue.get_nowait()
+            self._queue.task_done()
+            self._drop(oldest[0])
+        except queue.Empty:
+            pass
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self._drop(item[0])
+            return False
+        logger.warning(f'Sink {self.name} is full, oldest change dropped')
+        return True
+
+    def _drop(self, change: StatusChange) -> None:
+        self.dropped += 1
+        self._report_failure(change, f'Sink {self.name} is full')
+
+    def _report_failure(self, change: StatusChange, error: str) -> None:
+        if self.on_failure is None:
+            return
+        try:
+            self.on_failure(change, error)
+        except Exception as hook_error:
+            logger.error(f'Failure of sink {self.name} not '
+                         f'recorded: {hook_error}')
+
+    def _deliver(self, change: StatusChange, queued_ns: int,
+                 parent=None) -> None:
+        started_ns = time.time_ns()
+        registry.timing(f'sink.{self.name}.queue_wait',
+                        (started_ns - queued_ns) / 1e9)
+        tracer.record('queue.wait', queued_ns, started_ns, parent,
+                      sink=self.name)
+        try:
+            with tracer.span(f'{self.name}.deliver', parent,
+                             sink=self.name) as span:
+                if self.deliver(change) is False:
+                    return
+                if change.updated:
+                    latency = self.clock.time() - change.updated
+                    span.set_attribute('e2e_latency', latency)
+                    registry.timing(f'sink.{self.name}.e2e_latency',
+                                    latency)
+        except Exception as error:
+            self.failed += 1
+            logger.error(f'Sink {self.name} failed: {error}')
+            self._report_failure(change, str(error))
+            return
+        self.delivered += 1
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            try:
+                if item is _STOP:
+                    return
+                self._deliver(*item)
+            finally:
+                self._queue.task_done()
+
+    def start(self) -> None:
+        """Starting the worker thread."""
+        if self._queue is None or self._thread is not None:
+            return
+        self._thread = threading.Thread(
+            target=self._run, name=f'sink-{self.name}', daemon=True
+        )
+        self._thread.start()
+
+    def deliver_inline(self, inline: bool) -> None:
+        """Switching delivery to the publisher, once the queue is drained."""
+        if inline and not self.inline and self._thread is not None:
+            self._queue.join()
+        self.inline = inline
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Delivering what is queued and stopping the worker thread."""
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+            self._thread = None
+        self.close()
+
+    def close(self) -> None:
+        """Releasing resources held by the sink."""
+
+
+class TelegramSink(Sink):
+    """Sends rendered changes to their chats with the bot.
+
+    send returning False means the message was not delivered. With dedup,
+    changes already delivered are skipped and counted in duplicates, not
+    in delivered.
+    """
+
+    name = 'telegram'
+
+    def __init__(self, bot, render: Callable[[StatusChange], str],
+                 send: Callable, dedup: Optional[DedupStore] = None,
+                 **kwargs) -> None:
+        kwargs.setdefault('policy', BLOCK)
+        super().__init__(**kwargs)
+        self.bot = bot
+        self.render = render
+        self.send = send
+        self.dedup = dedup
+        self.duplicates = 0
+
+    def deliver(self, change: StatusChange) -> bool:
+        """Sending a change to Telegram once."""
+        key = None
+        if self.dedup is not None:
+            key = delivery_key(change)
+            if key in self.dedup:
+                self.duplicates += 1
+                registry.increment(f'sink.{self.name}.duplicates')
+                logger.info(f'Duplicate of {change.homework_name} skipped')
+                return False
+        if self.send(self.bot, change.chat_id, self.render(change)) is False:
+            raise DeliveryError('Message not sent')
+        if key is not None:
+            self.dedup.add(key)
+        return True
+
+
+class WebhookSink(Sink):
+    """Posts changes as JSON to a local webhook."""
+
+    name = 'webhook'
+
+    def __init__(self, url: str, timeout: float = 5.0, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.url = url
+        self.timeout = timeout
+
+    def deliver(self, change: StatusChange) -> None:
+        """Posting a change to the webhook."""
+        response = requests.post(
+            self.url, json=change._asdict(), timeout=self.timeout
+        )
+        response.raise_for_status()
+
+
+class JsonlSink(Sink):
+    """Appends changes to a file, one JSON record per line."""
+
+    name = 'jsonl'
+
+    def __init__(self, path: str, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.path = path
+        self._file = None
+
+    def deliver(self, change: StatusChange) -> None:
+        """Appending a change to the file."""
+        if self._file is None:
+            self._file = open(self.path, 'a', encoding='utf-8')
+        self._file.write(
+            json.dumps(change._asdict(), ensure_ascii=False) + '\n'
+        )
+        self._file.flush()
+
+    def close(self) -> None:
+        """Closing the file."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class StreamSink(Sink):
+    """Writes changes as JSON lines to a text stream."""
+
+    name = 'stream'
+
+    def __init__(self, stream: TextIO = None, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.stream = stream or sys.stdout
+
+    def deliver(self, change: StatusChange) -> None:
+        """Writing a change to the stream."""
+        self.stream.write(
+            json.dumps(change._asdict(), ensure_ascii=False) + '\n'
+        )
+        self.stream.flush()
+
+
+def build_sinks(spec: str, **kwargs) -> List[Sink]:
+    """Building sinks from a spec like "jsonl:changes.jsonl,stdout".
+
+    kwargs are passed to every sink.
+    """
+    sinks = []
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        kind, _, target = item.partition(':')
+        if kind == 'jsonl':
+            sinks.append(JsonlSink(target or 'changes.jsonl', **kwargs))
+        elif kind == 'webhook':
+            sinks.append(WebhookSink(target, **kwargs))
+        elif kind == 'stdout':
+            sinks.append(StreamSink(**kwargs))
+        else:
+            raise ValueError(f'Unknown sink: {item}')
+    return sinks
+
+
+class Pipeline:
+    """Publish/subscribe stage between a change stream and sinks."""
+
+    def __init__(self, sinks: Iterable[Sink] = ()) -> None:
+        self.sinks = list(sinks)
+        self._unsubscribe = None
+
+    def add(self, sink: Sink) -> Sink:
+        """Adding a sink to the pipeline."""
+        self.sinks.append(sink)
+        return sink
+
+    def publish(self, change: StatusChange) -> None:
+        """Offering a change to every sink."""
+        for sink in self.sinks:
+            sink.offer(change)
+
+    def start(self) -> None:
+        """Starting the worker of every sink."""
+        for sink in self.sinks:
+            sink.start()
+
+    def attach(self, stream: ChangeStream) -> None:
+        """Subscribing the pipeline to a change stream and starting it."""
+        self.start()
+        self._unsubscribe = stream.subscribe(self.publish)
+
+    def deliver_inline(self, inline: bool) -> None:
+        """Switching every sink to delivery by the publisher."""
+        for sink in self.sinks:
+            sink.deliver_inline(inline)
+
+    def depths(self) -> dict:
+        """Queue depth of every sink."""
+        return {sink.name: sink.depth for sink in self.sinks}
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """Unsubscribing and draining every sink."""
+        if self._unsubscribe is not None:
+            self._unsubscribe()
+            self._unsubscribe = None
+        for sink in self.sinks:
+            sink.stop(timeout)
@@ -0,0 +1,269 @@
+"""Soak test of the polling loop for memory leaks.
+
+Usage: python soak.py [--weeks 4] [--sample-every 100]
+
+main() runs unchanged against local fake Practicum and Telegram servers
+with a virtual clock as the clock of the loop, so weeks of polling take
+minutes. The load is deterministic: statuses change on a
+schedule and the API fails or answers nonsense now and then. RSS and the
+number of live objects are sampled during the run, which fails if they
+keep growing after the warm-up.
+"""
+import argparse
+import gc
+import json
+import logging
+import os
+import statistics
+import sys
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from datetime import datetime, timezone
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, NamedTuple
+from unittest import mock
+
+import homework
+from clock import VirtualClock
+from state import STATUSES
+
+WEEK = 7 * 24 * 3600
+TELEGRAM_TOKEN = '123456:soak-test-token'
+
+
+class SoakFinished(Exception):
+    """Stops the polling loop after the last round."""
+
+
+class Sample(NamedTuple):
+    """Memory of the process after a round."""
+
+    round: int
+    rss: int
+    objects: int
+
+
+def rss_bytes() -> int:
+    """Resident set size of the process."""
+    try:
+        with open('/proc/self/statm', encoding='ascii') as file:
+            return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        import resource
+
+        # Peak RSS, in kilobytes on Linux, where statm is missing anyway.
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def take_sample(number: int) -> Sample:
+    """Measuring memory after a full garbage collection."""
+    gc.collect()
+    return Sample(number, rss_bytes(), len(gc.get_objects()))
+
+
+def growth(samples: List[Sample], field: str) -> float:
+    """Growth of a measure between two halves of the run after warm-up.
+
+    The first quarter of samples is the warm-up; medians of the halves
+    of the rest are compared, so single spikes do not count.
+    """
+    steady = [getattr(sample, field) for sample in samples[len(samples) // 4:]]
+    if len(steady) < 2:
+        return 0.0
+    middle = len(steady) // 2
+    return statistics.median(steady[middle:]) - statistics.median(
+        steady[:middle]
+    )
+
+
+class SoakReport(NamedTuple):
+    """Outcome of a soak run."""
+
+    rounds: int
+    virtual_seconds: float
+    seconds: float
+    requests: int
+    messages: int
+    samples: List[Sample]
+
+    @property
+    def rss_growth(self) -> float:
+        """Growth of RSS after warm-up in bytes."""
+        return growth(self.samples, 'rss')
+
+    @property
+    def object_growth(self) -> float:
+        """Growth of the number of live objects after warm-up."""
+        return growth(self.samples, 'objects')
+
+    def leaking(self, rss_limit: float, objects_limit: float) -> bool:
+        """Whether memory grew more than the limits allow."""
+        return (self.rss_growth > rss_limit
+                or self.object_growth > objects_limit)
+
+
+class _Handler(BaseHTTPRequestHandler):
+
+    def reply(self, status: int, data) -> None:
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+class FakePracticum(_Handler):
+    """Practicum API with a deterministic schedule of changes."""
+
+    homeworks = 20
+    change_every = 7
+    fail_every = 50
+    broken_every = 97
+
+    def do_GET(self) -> None:
+        """Answering a poll."""
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            number = server.requests
+        now = int(server.clock.time())
+        if number % self.fail_every == 0:
+            self.reply(500, {'message': 'Internal error'})
+            return
+        if number % self.broken_every == 0:
+            self.reply(200, {'homeworks': None, 'current_date': now})
+            return
+        updated = datetime.fromtimestamp(now, timezone.utc).strftime(
+            '%Y-%m-%dT%H:%M:%SZ'
+        )
+        self.reply(200, {'homeworks': [
+            {'id': index, 'homework_name': f'student__hw{index:02d}.zip',
+             'status': STATUSES[(number // self.change_every + index) % 3],
+             'date_updated': updated, 'reviewer_comment': 'Fine' * 50}
+            for index in range(self.homeworks)
+            if (number + index) % self.change_every == 0
+        ], 'current_date': now})
+
+
+class FakeTelegram(_Handler):
+    """Telegram Bot API accepting every message."""
+
+    def do_POST(self) -> None:
+        """Accepting a message."""
+        server = self.server
+        length = int(self.headers.get('Content-Length', 0))
+        try:
+            data = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            data = {}
+        with server.lock:
+            server.requests += 1
+            number = server.requests
+        self.reply(200, {'ok': True, 'result': {
+            'message_id': number, 'date': int(server.clock.time()),
+            'chat': {'id': int(data.get('chat_id', 1)), 'type': 'private'},
+            'text': data.get('text', ''),
+        }})
+
+
+@contextmanager
+def serve(handler, clock: VirtualClock):
+    """Running a fake server on a free local port."""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    server.daemon_threads = True
+    server.clock = clock
+    server.lock = threading.Lock()
+    server.requests = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def soak(rounds: int, sample_every: int = 100) -> SoakReport:
+    """Running main() for a number of polling rounds."""
+    samples = []
+    clock = VirtualClock()
+    done = 0
+
+    def end_round(seconds: float) -> None:
+        nonlocal done
+        done += 1
+        if done % sample_every == 0:
+            samples.append(take_sample(done))
+        if done >= rounds:
+            raise SoakFinished
+
+    clock.on_sleep = end_round
+    started = time.perf_counter()
+    with ExitStack() as stack:
+        practicum = stack.enter_context(serve(FakePracticum, clock))
+        telegram = stack.enter_context(serve(FakeTelegram, clock))
+        base_url = f'http://127.0.0.1:{telegram.server_port}/bot'
+        for target, name, value in (
+            (homework, 'runtime', clock),
+            (homework.telegram, 'Bot',
+             partial(homework.telegram.Bot, base_url=base_url)),
+            (homework, 'ENDPOINT',
+             f'http://127.0.0.1:{practicum.server_port}/'),
+            (homework, 'PRACTICUM_TOKEN', 'soak'),
+            (homework, 'TELEGRAM_TOKEN', TELEGRAM_TOKEN),
+            (homework, 'TELEGRAM_CHAT_ID', '1'),
+            (homework, 'STATE_FILE', ''),
+            (homework, 'METRICS_FILE', ''),
+        ):
+            stack.enter_context(mock.patch.object(target, name, value))
+        try:
+            homework.main()
+        except SoakFinished:
+            pass
+        requests, messages = practicum.requests, telegram.requests
+    return SoakReport(done, clock.elapsed, time.perf_counter() - started,
+                      requests, messages, samples)
+
+
+def cli(argv=None) -> int:
+    """Running a soak test from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--weeks', type=float, default=4.0,
+                        help='virtual time to simulate, default: %(default)s')
+    parser.add_argument('--sample-every', type=int, default=100,
+                        help='rounds between memory samples')
+    parser.add_argument('--rss-limit', type=float, default=8.0,
+                        help='allowed RSS growth in MiB')
+    parser.add_argument('--objects-limit', type=int, default=2000,
+                        help='allowed growth of live objects')
+    args = parser.parse_args(argv)
+    # Logging is exercised in full but goes nowhere.
+    logging.basicConfig(
+        format='%(asctime)s | %(levelname)s | %(message)s',
+        level=logging.DEBUG,
+        handlers=[logging.StreamHandler(open(os.devnull, 'w'))],
+    )
+    report = soak(int(args.weeks * WEEK / homework.RETRY_PERIOD),
+                  args.sample_every)
+    for sample in report.samples:
+        print(f'round {sample.round}\t{sample.rss / 2**20:.1f} MiB\t'
+              f'{sample.objects} objects')
+    print(f'{report.rounds} rounds ({report.virtual_seconds / WEEK:.1f} '
+          f'weeks) in {report.seconds:.1f} s, {report.requests} requests, '
+          f'{report.messages} messages')
+    print(f'growth after warm-up: {report.rss_growth / 2**20:.2f} MiB, '
+          f'{report.object_growth:.0f} objects')
+    leaking = report.leaking(args.rss_limit * 2**20, args.objects_limit)
+    if leaking:
+        print('Memory keeps growing')
+    return int(leaking)
+
+
+if __name__ == '__main__':
+    sys.exit(cli())
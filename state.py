@@ -0,0 +1,188 @@
+"""Compact state of subscriptions and their homeworks."""
+import sys
+import zlib
+from array import array
+from datetime import datetime
+from typing import Iterator, NamedTuple, Optional
+
+STATUSES = ('approved', 'reviewing', 'rejected')
+STATUS_CODES = {status: code for code, status in enumerate(STATUSES)}
+
+_RECORD_WIDTH = 3
+# Homeworks from which a subscription keeps an index of their positions.
+_INDEXED_FROM = 16
+
+
+class HomeworkRecord(NamedTuple):
+    """Last known state of one homework."""
+
+    homework_id: int
+    name: str
+    status: int
+    updated: int
+
+
+def encode_status(status: str) -> int:
+    """Turning a review status into its small int code."""
+    if status not in STATUS_CODES:
+        raise ValueError('Unknown check status')
+    return STATUS_CODES[status]
+
+
+def decode_status(code: int) -> str:
+    """Turning a status code back into the review status."""
+    return STATUSES[code]
+
+
+def homework_key(homework: dict) -> int:
+    """Getting a stable integer id of a homework."""
+    homework_id = homework.get('id')
+    if isinstance(homework_id, int):
+        return homework_id
+    return zlib.crc32(homework['homework_name'].encode())
+
+
+def parse_date(value: Optional[str]) -> int:
+    """Converting date_updated of the API into a unix timestamp."""
+    if not value:
+        return 0
+    moment = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    return int(moment.timestamp())
+
+
+class Subscription:
+    """State of one chat subscribed to one Practicum token.
+
+    Homeworks are kept in a flat array of (id, status, updated) triples
+    with interned names alongside, which is much smaller than a dict of
+    rendered messages. Small subscriptions are scanned and sized exactly;
+    from _INDEXED_FROM homeworks on, positions are indexed by id and the
+    array grows in place, so long histories stay linear.
+    """
+
+    __slots__ = ('chat_id', 'token', 'cursor', 'next_due',
+                 '_records', '_names', '_positions')
+
+    def __init__(self, chat_id, token: str, cursor: int = 0,
+                 next_due: float = 0.0) -> None:
+        self.chat_id = chat_id
+        self.token = token
+        self.cursor = cursor
+        self.next_due = next_due
+        self._records = array('q')
+        self._names = ()
+        self._positions = None
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def _index(self, homework_id: int) -> int:
+        if self._positions is not None:
+            return self._positions.get(homework_id, -1)
+        records = self._records
+        for index in range(0, len(records), _RECORD_WIDTH):
+            if records[index] == homework_id:
+                return index // _RECORD_WIDTH
+        return -1
+
+    def get(self, homework_id: int) -> Optional[HomeworkRecord]:
+        """Getting the last known state of a homework."""
+        index = self._index(homework_id)
+        if index < 0:
+            return None
+        offset = index * _RECORD_WIDTH
+        return HomeworkRecord(
+            homework_id, self._names[index],
+            self._records[offset + 1], self._records[offset + 2]
+        )
+
+    def set(self, homework_id: int, name: str, status: int,
+            updated: int) -> None:
+        """Remembering the state of a homework."""
+        index = self._index(homework_id)
+        if index < 0:
+            self._append(homework_id, sys.intern(name), status, updated)
+            return
+        offset = index * _RECORD_WIDTH
+        self._records[offset + 1] = status
+        self._records[offset + 2] = updated
+        if self._names[index] == name:
+            return
+        if self._positions is not None:
+            self._names[index] = sys.intern(name)
+            return
+        names = list(self._names)
+        names[index] = sys.intern(name)
+        self._names = tuple(names)
+
+    def _append(self, homework_id: int, name: str, status: int,
+                updated: int) -> None:
+        if self._positions is not None:
+            self._positions[homework_id] = len(self._names)
+            self._records.extend((homework_id, status, updated))
+            self._names.append(name)
+            return
+        # Concatenation allocates exactly, unlike extend().
+        self._records = self._records + array(
+            'q', (homework_id, status, updated)
+        )
+        self._names += (name,)
+        if len(self._names) >= _INDEXED_FROM:
+            self._names = list(self._names)
+            self._positions = {
+                self._records[index * _RECORD_WIDTH]: index
+                for index in range(len(self._names))
+            }
+
+    def update(self, homework: dict) -> HomeworkRecord:
+        """Remembering a homework as returned by the API."""
+        record = HomeworkRecord(
+            homework_key(homework),
+            homework['homework_name'],
+            encode_status(homework['status']),
+            parse_date(homework.get('date_updated')),
+        )
+        self.set(*record)
+        return record
+
+    def records(self) -> Iterator[HomeworkRecord]:
+        """Iterating over the known homeworks."""
+        records = self._records
+        for index, name in enumerate(self._names):
+            offset = index * _RECORD_WIDTH
+            yield HomeworkRecord(
+                records[offset], name,
+                records[offset + 1], records[offset + 2]
+            )
+
+
+class StateStore:
+    """In-memory registry of subscriptions keyed by chat id."""
+
+    __slots__ = ('_subscriptions',)
+
+    def __init__(self) -> None:
+        self._subscriptions = {}
+
+    def __len__(self) -> int:
+        return len(self._subscriptions)
+
+    def __iter__(self) -> Iterator[Subscription]:
+        return iter(self._subscriptions.values())
+
+    def get(self, chat_id) -> Optional[Subscription]:
+        """Getting a subscription by chat id."""
+        return self._subscriptions.get(chat_id)
+
+    def add(self, subscription: Subscription) -> Subscription:
+        """Registering a subscription."""
+        self._subscriptions[subscription.chat_id] = subscription
+        return subscription
+
+    def subscribe(self, chat_id, token: str,
+                  cursor: int = 0) -> Subscription:
+        """Getting a subscription, creating it when missing."""
+        subscription = self._subscriptions.get(chat_id)
+        if subscription is None:
+            subscription = self.add(Subscription(chat_id, token, cursor))
+        return subscription
@@ -0,0 +1,233 @@
+"""SQLite persistence of subscriptions, cursors and homework statuses."""
+import sqlite3
+import threading
+from typing import Iterable, List, Optional
+
+from changes import StatusChange
+from clock import system_clock
+from state import Subscription
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS subscriptions (
+    chat_id TEXT PRIMARY KEY,
+    token TEXT NOT NULL,
+    cursor INTEGER NOT NULL DEFAULT 0,
+    next_due REAL NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS subscriptions_next_due
+    ON subscriptions (next_due);
+CREATE TABLE IF NOT EXISTS homeworks (
+    chat_id TEXT NOT NULL,
+    homework_id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    status INTEGER NOT NULL,
+    updated INTEGER NOT NULL,
+    PRIMARY KEY (chat_id, homework_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS failed_deliveries (
+    id INTEGER PRIMARY KEY,
+    chat_id TEXT NOT NULL,
+    homework_id INTEGER NOT NULL,
+    homework_name TEXT NOT NULL,
+    old_status TEXT,
+    status TEXT NOT NULL,
+    updated INTEGER NOT NULL,
+    error TEXT NOT NULL,
+    failed_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS deliveries (
+    key INTEGER PRIMARY KEY,
+    expires REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS deliveries_expires ON deliveries (expires);
+'''
+
+
+class Storage:
+    """State store persisted between runs of the bot.
+
+    Failed deliveries may be recorded from sink threads, so the connection
+    is shared between threads behind a lock.
+    """
+
+    def __init__(self, path: str, clock=system_clock) -> None:
+        self.path = path
+        self.clock = clock
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> 'Storage':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Closing the database."""
+        with self._lock:
+            self.connection.close()
+
+    def _attach_homeworks(self, subscriptions: List[Subscription],
+                          condition: str, params: tuple) -> None:
+        by_chat = {
+            subscription.chat_id: subscription
+            for subscription in subscriptions
+        }
+        rows = self.connection.execute(
+            'SELECT h.chat_id, h.homework_id, h.name, h.status, h.updated '
+            'FROM homeworks h JOIN subscriptions s USING (chat_id) '
+            f'WHERE {condition}', params
+        )
+        for chat_id, homework_id, name, status, updated in rows:
+            subscription = by_chat.get(chat_id)
+            if subscription is not None:
+                subscription.set(homework_id, name, status, updated)
+
+    def _load(self, condition: str, params: tuple,
+              limit: Optional[int] = None) -> List[Subscription]:
+        query = (
+            'SELECT chat_id, token, cursor, next_due FROM subscriptions s '
+            f'WHERE {condition} ORDER BY next_due'
+        )
+        if limit is not None:
+            query += f' LIMIT {int(limit)}'
+        subscriptions = [
+            Subscription(*row)
+            for row in self.connection.execute(query, params)
+        ]
+        if subscriptions:
+            self._attach_homeworks(subscriptions, condition, params)
+        return subscriptions
+
+    def load_subscription(self, chat_id) -> Optional[Subscription]:
+        """Loading one subscription with its homeworks."""
+        subscriptions = self._load('s.chat_id = ?', (str(chat_id),))
+        return subscriptions[0] if subscriptions else None
+
+    def load_due(self, now: float,
+                 limit: Optional[int] = None) -> List[Subscription]:
+        """Loading subscriptions due for polling, earliest first."""
+        return self._load('s.next_due <= ?', (now,), limit)
+
+    def load_all(self) -> List[Subscription]:
+        """Loading every subscription."""
+        return self._load('1', ())
+
+    def register(self, chat_id, token: str, cursor: int = 0,
+                 update_token: bool = False) -> bool:
+        """Adding a subscription unless the chat is already subscribed.
+
+        With update_token the token of a subscribed chat is replaced,
+        keeping its cursor. True if the chat was added or changed.
+        """
+        conflict = ('ON CONFLICT (chat_id) DO UPDATE SET token = '
+                    'excluded.token WHERE token != excluded.token'
+                    if update_token else 'ON CONFLICT DO NOTHING')
+        with self._lock, self.connection:
+            result = self.connection.execute(
+                'INSERT INTO subscriptions (chat_id, token, cursor) '
+                f'VALUES (?, ?, ?) {conflict}', (str(chat_id), token, cursor)
+            )
+        return result.rowcount == 1
+
+    def save(self, subscriptions: Iterable[Subscription]) -> int:
+        """Writing subscriptions and their homeworks in one transaction."""
+        subscriptions = list(subscriptions)
+        with self._lock, self.connection:
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO subscriptions '
+                '(chat_id, token, cursor, next_due) VALUES (?, ?, ?, ?)',
+                [
+                    (str(subscription.chat_id), subscription.token,
+                     subscription.cursor, subscription.next_due)
+                    for subscription in subscriptions
+                ]
+            )
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO homeworks '
+                '(chat_id, homework_id, name, status, updated) '
+                'VALUES (?, ?, ?, ?, ?)',
+                [
+                    (str(subscription.chat_id), *record)
+                    for subscription in subscriptions
+                    for record in subscription.records()
+                ]
+            )
+        return len(subscriptions)
+
+    def count(self) -> int:
+        """Number of subscriptions."""
+        return self.connection.execute(
+            'SELECT COUNT(*) FROM subscriptions'
+        ).fetchone()[0]
+
+    def list_subscriptions(self, limit: int = 20,
+                           offset: int = 0) -> List[tuple]:
+        """(chat_id, cursor, next_due, homeworks) rows by next due time."""
+        return self.connection.execute(
+            'SELECT chat_id, cursor, next_due, (SELECT COUNT(*) '
+            'FROM homeworks h WHERE h.chat_id = s.chat_id) '
+            'FROM subscriptions s ORDER BY next_due LIMIT ? OFFSET ?',
+            (limit, offset)
+        ).fetchall()
+
+    def record_failure(self, change: StatusChange, error: str) -> None:
+        """Remembering a change that could not be delivered."""
+        with self._lock, self.connection:
+            self.connection.execute(
+                'INSERT INTO failed_deliveries (chat_id, homework_id, '
+                'homework_name, old_status, status, updated, error, '
+                'failed_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (str(change.chat_id), *change[1:], error,
+                 self.clock.time())
+            )
+
+    def failures(self, limit: int = 20) -> List[tuple]:
+        """(id, change, error, failed_at) of failed deliveries."""
+        rows = self.connection.execute(
+            'SELECT id, chat_id, homework_id, homework_name, old_status, '
+            'status, updated, error, failed_at FROM failed_deliveries '
+            'ORDER BY id LIMIT ?', (limit,)
+        )
+        return [
+            (row[0], StatusChange(*row[1:7]), row[7], row[8]) for row in rows
+        ]
+
+    def get_failure(self, failure_id: int) -> Optional[StatusChange]:
+        """Getting the change of a failed delivery."""
+        row = self.connection.execute(
+            'SELECT chat_id, homework_id, homework_name, old_status, '
+            'status, updated FROM failed_deliveries WHERE id = ?',
+            (failure_id,)
+        ).fetchone()
+        return StatusChange(*row) if row else None
+
+    def delete_failure(self, failure_id: int) -> None:
+        """Forgetting a failed delivery."""
+        with self._lock, self.connection:
+            self.connection.execute(
+                'DELETE FROM failed_deliveries WHERE id = ?', (failure_id,)
+            )
+
+    def record_delivery(self, key: int, expires: float) -> None:
+        """Remembering a delivered notification until it expires."""
+        with self._lock, self.connection:
+            self.connection.execute(
+                'INSERT OR REPLACE INTO deliveries VALUES (?, ?)',
+                (key, expires)
+            )
+
+    def has_delivery(self, key: int, now: float) -> bool:
+        """Whether a notification was delivered and has not expired."""
+        return self.connection.execute(
+            'SELECT 1 FROM deliveries WHERE key = ? AND expires > ?',
+            (key, now)
+        ).fetchone() is not None
+
+    def expire_deliveries(self, now: float) -> int:
+        """Deleting expired notifications, returns their number."""
+        with self._lock, self.connection:
+            return self.connection.execute(
+                'DELETE FROM deliveries WHERE expires <= ?', (now,)
+            ).rowcount
@@ -0,0 +1,140 @@
+"""Incremental parsing of API responses with long homework histories.
+
+The body is read in chunks and the "homeworks" array is decoded one item
+at a time, so only the current item and one chunk are held in memory
+whatever the size of the response.
+"""
+import codecs
+import json
+from typing import Callable, Iterable, Iterator, Optional, Tuple
+
+_WHITESPACE = ' \t\n\r'
+
+_decoder = json.JSONDecoder()
+
+
+class HomeworkStream:
+    """Iterable of homeworks of a response body given as chunks.
+
+    Other top-level fields, like current_date, are collected in fields
+    while iterating and validated once the body is consumed. With keep,
+    homeworks are reduced to those keys as soon as they are decoded.
+    """
+
+    def __init__(self, chunks: Iterable[bytes],
+                 close: Optional[Callable[[], None]] = None,
+                 keep: Optional[Tuple[str, ...]] = None) -> None:
+        self.fields = {}
+        self.bytes_read = 0
+        self.keep = keep
+        self._chunks = iter(chunks)
+        self._close = close
+        self._decode = codecs.getincrementaldecoder('utf-8')().decode
+        self._buffer = ''
+        self._position = 0
+        self._eof = False
+
+    @property
+    def current_date(self) -> int:
+        """current_date of the response, known after iteration."""
+        return self.fields['current_date']
+
+    def _fill(self) -> bool:
+        if self._eof:
+            return False
+        # Dropping the consumed part keeps the buffer at about one item.
+        self._buffer = self._buffer[self._position:]
+        self._position = 0
+        for chunk in self._chunks:
+            if isinstance(chunk, bytes):
+                self.bytes_read += len(chunk)
+                chunk = self._decode(chunk)
+            if chunk:
+                self._buffer += chunk
+                return True
+        self._buffer += self._decode(b'', final=True)
+        self._eof = True
+        return False
+
+    def _skip_whitespace(self) -> str:
+        while True:
+            buffer = self._buffer
+            position = self._position
+            while position < len(buffer) and buffer[position] in _WHITESPACE:
+                position += 1
+            self._position = position
+            if position < len(buffer):
+                return buffer[position]
+            if not self._fill():
+                raise ValueError('Unexpected end of the response')
+
+    def _expect(self, characters: str) -> str:
+        character = self._skip_whitespace()
+        if character not in characters:
+            raise TypeError(
+                f'Unexpected "{character}" in the response, '
+                f'expected one of "{characters}"'
+            )
+        self._position += 1
+        return character
+
+    def _value(self):
+        self._skip_whitespace()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(
+                    self._buffer, self._position
+                )
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # A number may continue in the next chunk.
+            if end < len(self._buffer) or self._eof:
+                self._position = end
+                return value
+            self._fill()
+
+    def _homeworks(self) -> Iterator[dict]:
+        if self._expect('[n') == 'n':
+            raise TypeError('homeworks is not a list')
+        if self._skip_whitespace() == ']':
+            self._position += 1
+            return
+        while True:
+            homework = self._value()
+            if not isinstance(homework, dict):
+                raise TypeError('homework is not a dictionary')
+            if self.keep is not None:
+                homework = {
+                    key: homework[key] for key in self.keep if key in homework
+                }
+            yield homework
+            if self._expect(',]') == ']':
+                return
+
+    def __iter__(self) -> Iterator[dict]:
+        try:
+            if self._expect('{[') == '[':
+                raise TypeError('Query is not a dictionary')
+            seen_homeworks = False
+            if self._skip_whitespace() == '}':
+                self._position += 1
+            else:
+                while True:
+                    key = self._value()
+                    self._expect(':')
+                    if key == 'homeworks':
+                        seen_homeworks = True
+                        yield from self._homeworks()
+                    else:
+                        self.fields[key] = self._value()
+                    if self._expect(',}') == '}':
+                        break
+        finally:
+            if self._close is not None:
+                self._close()
+        if not seen_homeworks:
+            raise TypeError('homeworks is not a list')
+        if not isinstance(self.fields.get('current_date'), int):
+            raise TypeError('The server sent an unknown date format')
@@ -0,0 +1,96 @@
+import io
+import json
+
+import telegram
+
+import admin
+import utils
+from changes import StatusChange
+from state import Subscription
+from storage import Storage
+
+
+class TestAdmin:
+    CHANGE = StatusChange('42', 1, 'hw1', None, 'approved', 100)
+
+    def fill(self, path):
+        with Storage(path) as storage:
+            for number, next_due in ((1, 300), (2, 100), (3, 200)):
+                subscription = Subscription(str(number), f'token{number}',
+                                            1000)
+                subscription.next_due = next_due
+                subscription.set(number, f'hw{number}', 0, 1000)
+                storage.save([subscription])
+            storage.record_failure(self.CHANGE, 'Message not sent')
+
+    def run(self, *argv):
+        out = io.StringIO()
+        code = admin.cli(list(argv), out)
+        return code, out.getvalue()
+
+    def test_list_by_next_due(self, tmp_path):
+        path = str(tmp_path / 'state.sqlite3')
+        self.fill(path)
+        code, output = self.run('--state', path, 'list', '--limit', '2')
+        lines = output.splitlines()
+        assert code == 0
+        assert lines[0] == '3 subscriptions'
+        assert [line.split('\t')[0] for line in lines[2:]] == ['2', '3']
+
+    def test_show_masks_token(self, tmp_path):
+        path = str(tmp_path / 'state.sqlite3')
+        self.fill(path)
+        code, output = self.run('--state', path, 'show', '2')
+        assert code == 0
+        assert 'token2' not in output
+        assert 'ken2' in output
+        assert 'hw2\tapproved' in output
+        assert self.run('--state', path, 'show', '9')[0] == 1
+
+    def test_replay_deletes_delivered(self, monkeypatch, tmp_path):
+        path = str(tmp_path / 'state.sqlite3')
+        self.fill(path)
+        bots = []
+
+        def mock_telegram_bot(*args, **kwargs):
+            bots.append(utils.MockTelegramBot(**kwargs))
+            return bots[-1]
+
+        monkeypatch.setattr(telegram, 'Bot', mock_telegram_bot)
+        code, output = self.run('--state', path, 'failed')
+        assert code == 0
+        assert '1\t42\thw1\tapproved' in output
+        assert self.run('--state', path, 'replay', '1')[0] == 0
+        assert bots[0].chat_id == '42'
+        with Storage(path) as storage:
+            assert storage.failures() == []
+        assert self.run('--state', path, 'replay', '1')[0] == 1
+
+    def test_queues_from_metrics(self, tmp_path):
+        path = tmp_path / 'metrics.json'
+        path.write_text(json.dumps({'gauges': {
+            'queue.telegram': 3, 'sink.telegram.failed': 1, 'other': 5,
+        }}))
+        code, output = self.run('--metrics', str(path), 'queues')
+        assert code == 0
+        assert output == 'queue.telegram\t3\nsink.telegram.failed\t1\n'
+        assert self.run('--metrics', str(tmp_path / 'no.json'),
+                        'queues')[0] == 1
+
+    def test_queues_without_metrics_file(self, monkeypatch,
+                                         homework_module):
+        monkeypatch.setattr(homework_module, 'METRICS_FILE', '')
+        code, output = self.run('queues')
+        assert code == 1
+        assert 'METRICS_FILE is not set' in output
+
+    def test_show_state_of_main(self, monkeypatch, tmp_path,
+                                homework_module):
+        path = str(tmp_path / 'state.sqlite3')
+        utils.run_main(monkeypatch, homework_module, state_file=path)
+        code, output = self.run('--state', path, 'show', 'secret')
+        assert code == 0
+        assert 'hw1\tapproved' in output
+        assert self.run('--state', path, 'list')[1].startswith(
+            '1 subscriptions'
+        )
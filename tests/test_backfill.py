@@ -0,0 +1,77 @@
+import json
+import time
+
+import requests
+import telegram
+
+import utils
+from backfill import RateLimiter, backfill
+from clock import VirtualClock
+from storage import Storage
+
+
+class TestBackfill:
+
+    def mock_api(self, monkeypatch):
+        calls = []
+
+        def mock_get(*args, **kwargs):
+            token = kwargs['headers']['Authorization'].split()[1]
+            calls.append((token, kwargs['params']['from_date']))
+            if token == 'broken':
+                raise requests.RequestException('broken')
+            assert kwargs['stream']
+            body = json.dumps({
+                'homeworks': [
+                    {'id': number, 'homework_name': f'{token}_{number}',
+                     'status': 'approved'}
+                    for number in range(3)
+                ],
+                'current_date': 1000198991,
+            }).encode()
+            response = utils.MockResponseGET(*args, **kwargs)
+            response.iter_content = lambda chunk_size: (
+                body[start:start + 7] for start in range(0, len(body), 7)
+            )
+            response.close = lambda: None
+            return response
+
+        def no_bot(*args, **kwargs):
+            raise AssertionError('backfill must not use Telegram')
+
+        monkeypatch.setattr(requests, 'get', mock_get)
+        monkeypatch.setattr(telegram, 'Bot', no_bot)
+        return calls
+
+    def test_backfill_writes_histories(self, monkeypatch, tmp_path):
+        calls = self.mock_api(monkeypatch)
+        pairs = [(str(chat_id), f'token{chat_id}') for chat_id in range(10)]
+        pairs.append(('99', 'broken'))
+        with Storage(str(tmp_path / 'state.sqlite3')) as storage:
+            report = backfill(storage, pairs, workers=4, rate=1000,
+                              batch_size=3)
+            subscriptions = storage.load_all()
+        assert (report.tokens, report.failed, report.homeworks) == (
+            10, 1, 30
+        )
+        assert report.rate > 0
+        assert {from_date for _, from_date in calls} == {0}
+        assert len(subscriptions) == 10
+        assert all(
+            subscription.cursor == 1000198991 and len(subscription) == 3
+            for subscription in subscriptions
+        )
+
+    def test_rate_limiter(self):
+        limiter = RateLimiter(rate=100, burst=1)
+        started = time.monotonic()
+        for _ in range(6):
+            limiter.acquire()
+        assert time.monotonic() - started >= 0.045
+
+    def test_rate_limiter_on_virtual_clock(self):
+        clock = VirtualClock(0)
+        limiter = RateLimiter(rate=2, burst=3, clock=clock)
+        for _ in range(9):
+            limiter.acquire()
+        assert clock.time() == 3
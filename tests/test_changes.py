@@ -0,0 +1,74 @@
+import pytest
+
+from changes import ChangeStream, StatusChange, detect_changes
+from state import Subscription
+
+
+class TestChanges:
+    HOMEWORK = {
+        'id': 123,
+        'homework_name': 'hw123',
+        'status': 'reviewing',
+        'date_updated': '2020-02-13T14:40:57Z'
+    }
+
+    def test_new_homework_is_a_change(self):
+        subscription = Subscription('1', 'token')
+        changes = detect_changes(subscription, [self.HOMEWORK])
+        assert changes == [StatusChange(
+            '1', 123, 'hw123', None, 'reviewing', 1581604857
+        )]
+
+    def test_same_tuple_is_not_a_change(self):
+        subscription = Subscription('1', 'token')
+        detect_changes(subscription, [self.HOMEWORK])
+        assert detect_changes(subscription, [dict(self.HOMEWORK)]) == []
+
+    def test_transition_reports_old_status(self):
+        subscription = Subscription('1', 'token')
+        detect_changes(subscription, [self.HOMEWORK])
+        approved = dict(self.HOMEWORK, status='approved',
+                        date_updated='2020-02-14T10:00:00Z')
+        (change,) = detect_changes(subscription, [approved])
+        assert (change.old_status, change.status) == ('reviewing', 'approved')
+
+    def test_verdict_wording_does_not_matter(self, monkeypatch,
+                                             homework_module):
+        subscription = Subscription('1', 'token')
+        detect_changes(subscription, [self.HOMEWORK])
+        monkeypatch.setitem(homework_module.HOMEWORK_VERDICTS,
+                            'reviewing', 'New wording')
+        assert detect_changes(subscription, [self.HOMEWORK]) == []
+
+    @pytest.mark.parametrize('homework', [
+        {'homework_name': 'hw'}, {'status': 'approved'},
+        {'homework_name': 'hw', 'status': 'unknown'},
+    ])
+    def test_invalid_homework(self, homework):
+        with pytest.raises((KeyError, ValueError)):
+            detect_changes(Subscription('1', 'token'), [homework])
+
+    def test_invalid_homework_records_nothing(self):
+        subscription = Subscription('1', 'token')
+        broken = {'id': 2, 'homework_name': 'hw2', 'status': 'weird'}
+        with pytest.raises(ValueError):
+            detect_changes(subscription, [self.HOMEWORK, broken])
+        assert len(subscription) == 0
+        (change,) = detect_changes(subscription, [self.HOMEWORK])
+        assert change.homework_id == 123
+
+    def test_stream(self):
+        stream = ChangeStream()
+        received = []
+        unsubscribe = stream.subscribe(received.append)
+        change = StatusChange('1', 1, 'hw', None, 'approved', 0)
+        stream.publish(change)
+        unsubscribe()
+        stream.publish(change)
+        assert received == [change]
+
+    def test_render_change(self, homework_module):
+        change = StatusChange('1', 1, 'hw', None, 'approved', 0)
+        assert homework_module.render_change(change).endswith(
+            homework_module.HOMEWORK_VERDICTS['approved']
+        )
@@ -0,0 +1,60 @@
+import time
+
+import requests
+
+import utils
+from clock import SystemClock
+
+
+class TestClock:
+
+    def test_system_clock_follows_time_module(self, monkeypatch):
+        slept = []
+        monkeypatch.setattr(time, 'sleep', slept.append)
+        SystemClock().sleep(3)
+        assert slept == [3]
+
+    def run_main(self, monkeypatch, homework_module, rounds, get):
+        messages = []
+        monkeypatch.setattr(homework_module, 'send_to_chat',
+                            lambda bot, chat_id, text: messages.append(text))
+        monkeypatch.setattr(homework_module, 'send_message',
+                            lambda bot, text: messages.append(text))
+        started = time.perf_counter()
+        clock, sleeps = utils.run_main(monkeypatch, homework_module,
+                                       rounds, get)
+        return clock, sleeps, messages, time.perf_counter() - started
+
+    def test_thousands_of_rounds_take_no_real_time(self, monkeypatch,
+                                                   homework_module):
+        dates = []
+
+        def get(*args, **kwargs):
+            dates.append(kwargs['params']['from_date'])
+            response = utils.MockResponseGET(*args, **kwargs)
+            response.json = lambda: {'homeworks': [], 'current_date':
+                                     dates[-1] + 600}
+            return response
+
+        clock, sleeps, _, seconds = self.run_main(
+            monkeypatch, homework_module, 5000, get
+        )
+        assert sleeps == [homework_module.RETRY_PERIOD] * 5000
+        assert clock.elapsed == 5000 * homework_module.RETRY_PERIOD
+        assert dates[:3] == [1000, 1600, 2200]
+        assert seconds < 10
+
+    def test_error_digest_follows_virtual_time(self, monkeypatch,
+                                               homework_module):
+        def get(*args, **kwargs):
+            raise requests.RequestException('Service 503')
+
+        monkeypatch.setattr(homework_module, 'RETRY_PERIOD', 600)
+        monkeypatch.setattr(homework_module, 'ERROR_DIGEST_WINDOW', 3600)
+        _, _, messages, _ = self.run_main(
+            monkeypatch, homework_module, 13, get
+        )
+        assert len(messages) == 3
+        assert messages[0].startswith('Program crash:')
+        assert messages[1] == messages[2]
+        assert messages[1].startswith('Error digest:\n6 × ')
@@ -0,0 +1,84 @@
+import os
+
+import pytest
+
+from config import ConfigWatcher, Settings, parse
+from state import Subscription
+
+CURRENT = Settings(600, 'https://example.com/api/', {'approved': 'Yes'},
+                   'practicum', 'telegram', '1')
+
+
+def write(path, text, mtime):
+    path.write_text(text)
+    os.utime(path, ns=(mtime, mtime))
+
+
+class TestConfig:
+
+    def test_parse_overrides_given_keys(self):
+        settings = parse({
+            'RETRY_PERIOD': '60',
+            'HOMEWORK_VERDICT_REJECTED': 'No',
+            'TELEGRAM_CHAT_ID': '2',
+            'UNRELATED': 'x',
+        }, CURRENT)
+        assert settings == CURRENT._replace(
+            retry_period=60, telegram_chat_id='2',
+            verdicts={'approved': 'Yes', 'rejected': 'No'},
+        )
+        assert CURRENT.verdicts == {'approved': 'Yes'}
+
+    @pytest.mark.parametrize('values', [
+        {'RETRY_PERIOD': '0'}, {'RETRY_PERIOD': 'often'},
+        {'HOMEWORK_ENDPOINT': 'ftp://example.com'},
+        {'HOMEWORK_VERDICT_ON_HOLD': 'Paused'},
+    ])
+    def test_parse_rejects_invalid(self, values):
+        with pytest.raises(ValueError):
+            parse(values, CURRENT)
+
+    def test_watcher_reloads_changed_file(self, tmp_path):
+        path = tmp_path / 'bot.env'
+        watcher = ConfigWatcher(str(path))
+        assert watcher.poll(CURRENT) is None
+        write(path, 'RETRY_PERIOD=60\n', 10**18)
+        settings = watcher.poll(CURRENT)
+        assert settings.retry_period == 60
+        assert watcher.poll(settings) is None
+        write(path, 'RETRY_PERIOD=-1\n', 2 * 10**18)
+        assert watcher.poll(settings) is None
+        assert ConfigWatcher(None).poll(CURRENT) is None
+
+    def test_removed_lines_revert_to_baseline(self, tmp_path):
+        path = tmp_path / 'bot.env'
+        write(path, 'RETRY_PERIOD=60\nHOMEWORK_VERDICT_REJECTED=No\n', 10**18)
+        watcher = ConfigWatcher(str(path))
+        settings = watcher.poll(CURRENT)
+        assert settings.verdicts == {'approved': 'Yes', 'rejected': 'No'}
+        write(path, 'RETRY_PERIOD=60\n', 2 * 10**18)
+        settings = watcher.poll(settings)
+        assert settings == CURRENT._replace(retry_period=60)
+        path.unlink()
+        assert watcher.poll(settings) == CURRENT
+        assert watcher.poll(CURRENT) is None
+
+    def test_reload_applies_between_rounds(self, monkeypatch, tmp_path,
+                                           homework_module):
+        for name in ('RETRY_PERIOD', 'ENDPOINT', 'HOMEWORK_VERDICTS',
+                     'HEADERS', 'PRACTICUM_TOKEN', 'TELEGRAM_TOKEN',
+                     'TELEGRAM_CHAT_ID'):
+            monkeypatch.setattr(homework_module, name,
+                                getattr(homework_module, name))
+        path = tmp_path / 'bot.env'
+        write(path, 'RETRY_PERIOD=30\nPRACTICUM_TOKEN=new\n'
+                    'HOMEWORK_ENDPOINT=http://localhost/api/\n'
+                    'HOMEWORK_VERDICT_APPROVED=Done\n', 10**18)
+        subscription = Subscription('1', 'old')
+        homework_module.reload_settings(ConfigWatcher(str(path)),
+                                        subscription)
+        assert homework_module.RETRY_PERIOD == 30
+        assert homework_module.ENDPOINT == 'http://localhost/api/'
+        assert homework_module.HEADERS == {'Authorization': 'OAuth new'}
+        assert homework_module.HOMEWORK_VERDICTS['approved'] == 'Done'
+        assert subscription.token == 'new'
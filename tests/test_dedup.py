@@ -0,0 +1,111 @@
+import telegram
+
+import utils
+from changes import StatusChange
+from clock import VirtualClock
+from dedup import DedupStore, delivery_key
+from sinks import TelegramSink
+from storage import Storage
+
+CHANGE = StatusChange('1', 7, 'hw', 'reviewing', 'approved', 1000)
+
+
+class TestDedup:
+
+    def test_key_depends_on_every_field_but_name(self):
+        assert delivery_key(CHANGE) == delivery_key(
+            CHANGE._replace(homework_name='other', old_status=None)
+        )
+        for field, value in (('chat_id', '2'), ('homework_id', 8),
+                             ('status', 'rejected'), ('updated', 1001)):
+            assert delivery_key(CHANGE) != delivery_key(
+                CHANGE._replace(**{field: value})
+            )
+
+    def test_ttl_and_size_eviction(self):
+        clock = VirtualClock(0)
+        dedup = DedupStore(ttl=10, maxsize=3, clock=clock)
+        for key in range(4):
+            dedup.add(key)
+        assert len(dedup) == 3 and 0 not in dedup
+        clock.advance(5)
+        assert 1 in dedup
+        clock.advance(5)
+        assert (2 in dedup, 3 in dedup, 1 in dedup) == (False, False, True)
+        assert dedup.evicted == 3
+
+    def test_telegram_sink_sends_once(self):
+        sent = []
+        dedup = DedupStore()
+        sink = TelegramSink('bot', lambda change: change.homework_name,
+                            lambda *args: sent.append(args), maxsize=0,
+                            dedup=dedup)
+        sink.offer(CHANGE)
+        sink.offer(CHANGE)
+        sink.offer(CHANGE._replace(status='rejected'))
+        assert len(sent) == 2
+        assert (sink.delivered, sink.duplicates) == (2, 1)
+
+    def test_failed_send_is_not_remembered(self):
+        dedup = DedupStore()
+        sink = TelegramSink('bot', str, lambda *args: False, maxsize=0,
+                            dedup=dedup)
+        sink.offer(CHANGE)
+        assert len(dedup) == 0 and sink.failed == 1
+
+    def test_keys_survive_restarts(self, tmp_path):
+        clock = VirtualClock(0)
+        with Storage(str(tmp_path / 'state.sqlite3')) as storage:
+            dedup = DedupStore(ttl=10, clock=clock,
+                               on_add=storage.record_delivery)
+            dedup.add(1)
+            clock.advance(5)
+            dedup.add(2)
+            clock.advance(6)
+            restored = DedupStore(ttl=10, clock=clock,
+                                  on_add=storage.record_delivery,
+                                  lookup=storage.has_delivery)
+            assert (1 in restored, 2 in restored) == (False, True)
+            # A key found in storage is refreshed there.
+            clock.advance(8)
+            assert storage.has_delivery(2, clock.time())
+            assert storage.expire_deliveries(clock.time()) == 1
+
+    def test_main_does_not_remember_failed_send(self, monkeypatch,
+                                                tmp_path, homework_module):
+        path = str(tmp_path / 'state.sqlite3')
+
+        class FailingBot(utils.MockTelegramBot):
+            def send_message(self, chat_id=None, text=None, **kwargs):
+                raise telegram.error.TelegramError('Chat not found')
+
+        stores = []
+
+        class RecordedStore(DedupStore):
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, **kwargs)
+                stores.append(self)
+
+        monkeypatch.setattr(homework_module, 'DedupStore', RecordedStore)
+        utils.run_main(monkeypatch, homework_module, bot=FailingBot,
+                       state_file=path)
+        assert len(stores[0]) == 0
+        with Storage(path) as storage:
+            (failure,) = storage.failures()
+        assert failure[1].homework_name == 'hw1'
+        assert failure[2] == 'Message not sent'
+
+    def test_main_does_not_notify_twice_after_restart(self, monkeypatch,
+                                                      tmp_path,
+                                                      homework_module):
+        sent = []
+
+        class RecordingBot(utils.MockTelegramBot):
+            def send_message(self, chat_id=None, text=None, **kwargs):
+                sent.append(text)
+
+        path = str(tmp_path / 'state.sqlite3')
+        for _ in range(2):
+            utils.run_main(monkeypatch, homework_module, bot=RecordingBot,
+                           state_file=path)
+        assert len(sent) == 1
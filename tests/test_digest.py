@@ -0,0 +1,59 @@
+from digest import ErrorDigest, fingerprint
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestDigest:
+
+    def test_fingerprint_masks_numbers(self):
+        assert fingerprint(ValueError('status 502 at 12:03')) == (
+            fingerprint(ValueError('status 503 at 12:04'))
+        )
+        assert fingerprint(ValueError('x')) != fingerprint(TypeError('x'))
+
+    def test_alternating_errors_are_folded(self):
+        clock = FakeClock()
+        errors = ErrorDigest(60, clock=clock)
+        reported = [
+            errors.record('1', error) for error in (
+                ValueError('a'), KeyError('b'), ValueError('a'),
+                KeyError('b'), ValueError('a'),
+            )
+        ]
+        assert reported == [True, True, False, False, False]
+        assert errors.flush() == []
+        clock.now = 60
+        assert errors.flush() == [
+            ('1', "Error digest:\n2 × ValueError: a\n1 × KeyError: 'b'")
+        ]
+        assert not errors.record('1', ValueError('a'))
+        clock.now = 120
+        assert errors.flush() == [('1', 'Error digest:\n1 × ValueError: a')]
+        clock.now = 180
+        assert errors.flush() == []
+        assert len(errors) == 0
+        assert errors.record('1', ValueError('a'))
+
+    def test_no_digest_without_repeats(self):
+        errors = ErrorDigest(60)
+        errors.record('1', ValueError('a'))
+        assert errors.flush(force=True) == []
+
+    def test_deferred_digest_per_chat(self):
+        errors = ErrorDigest(immediate=False, max_kinds=1)
+        for number in range(1000):
+            assert not errors.record('operator', ValueError(f'{number}'))
+        errors.record('operator', KeyError('b'))
+        errors.record('other', KeyError('b'))
+        assert errors.flush(force=True) == [
+            ('operator', "Error digest:\n1000 × ValueError: 999\n"
+                         "1 × other errors, the last: KeyError: 'b'"),
+            ('other', "Error digest:\n1 × KeyError: 'b'"),
+        ]
@@ -0,0 +1,75 @@
+import json
+import urllib.error
+import urllib.request
+
+import utils
+from clock import VirtualClock
+from health import OPEN, Health
+
+
+def fetch(port, path):
+    try:
+        url = f'http://127.0.0.1:{port}{path}'
+        with urllib.request.urlopen(url) as answer:
+            return answer.status, json.load(answer)
+    except urllib.error.HTTPError as error:
+        return error.code, json.load(error) if error.code == 503 else None
+
+
+class TestHealth:
+
+    def test_liveness_follows_deadline(self):
+        clock = VirtualClock(0)
+        health = Health(clock)
+        assert not health.live
+        health.beat(60)
+        clock.advance(60)
+        assert health.live
+        clock.advance(1)
+        assert not health.live
+
+    def test_readiness_and_circuits(self):
+        health = Health(VirtualClock(0), threshold=2)
+        health.beat(60)
+        assert not health.ready
+        health.success('practicum')
+        assert health.ready
+        for _ in range(2):
+            health.failure('telegram', ValueError('down'))
+        assert health.state('telegram') == OPEN
+        assert not health.ready
+        health.success('telegram')
+        assert health.ready
+
+    def test_server_answers_without_the_loop(self):
+        clock = VirtualClock(0)
+        health = Health(clock)
+        health.depths = lambda: {'telegram': 2}
+        port = health.serve(0, '127.0.0.1')
+        try:
+            health.beat(60)
+            health.success('practicum')
+            status, state = fetch(port, '/readyz')
+            assert status == 200
+            assert state['queues'] == {'telegram': 2}
+            assert state['last_poll'] == 0
+            clock.advance(61)
+            assert fetch(port, '/livez')[0] == 503
+            assert fetch(port, '/health')[0] == 200
+            assert fetch(port, '/other')[0] == 404
+        finally:
+            health.close()
+
+    def test_main_reports_polls_and_sends(self, monkeypatch,
+                                          homework_module):
+        health = Health()
+        monkeypatch.setattr(homework_module, 'health', health)
+        utils.run_main(monkeypatch, homework_module)
+        state = health.snapshot()
+        assert state['live']
+        assert state['deadline'] == 1000 + homework_module.RETRY_PERIOD + (
+            homework_module.HEALTH_GRACE
+        )
+        assert state['last_poll'] == 1000
+        # The sink delivers on its own thread, after the loop went to sleep.
+        assert state['last_send'] is not None
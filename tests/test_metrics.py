@@ -0,0 +1,27 @@
+import json
+
+from metrics import Metrics, percentile
+
+
+class TestMetrics:
+
+    def test_percentile(self):
+        assert percentile([], 0.5) is None
+        assert percentile(range(100), 0.95) == 95
+
+    def test_snapshot_and_dump(self, tmp_path):
+        metrics = Metrics()
+        metrics.increment('polls')
+        metrics.increment('polls', 2)
+        metrics.gauge('queue.telegram', 4)
+        for value in (0.1, 0.2, 0.3):
+            metrics.timing('stage.get_api_answer', value)
+        path = tmp_path / 'metrics.json'
+        metrics.dump(str(path))
+        snapshot = json.loads(path.read_text())
+        assert snapshot['counters'] == {'polls': 3}
+        assert snapshot['gauges'] == {'queue.telegram': 4}
+        timing = snapshot['timings']['stage.get_api_answer']
+        assert (timing['count'], timing['max'], timing['p50']) == (
+            3, 0.3, 0.2
+        )
@@ -0,0 +1,143 @@
+import requests
+import telegram
+
+import utils
+from storage import Storage
+
+
+class TestOnce:
+    RESPONSE = {
+        'homeworks': [{'id': 1, 'homework_name': 'hw1',
+                       'status': 'approved'}],
+        'current_date': 1000198991,
+    }
+
+    def mock_api(self, monkeypatch, data):
+        calls = []
+
+        def mock_get(*args, **kwargs):
+            calls.append(kwargs)
+            response = utils.MockResponseGET(*args, **kwargs)
+            response.json = lambda: data
+            return response
+
+        monkeypatch.setattr(requests, 'get', mock_get)
+        return calls
+
+    def mock_bot(self, monkeypatch):
+        bots = []
+
+        def mock_telegram_bot(*args, **kwargs):
+            bots.append(utils.MockTelegramBot(**kwargs))
+            return bots[-1]
+
+        monkeypatch.setattr(telegram, 'Bot', mock_telegram_bot)
+        return bots
+
+    def test_run_once_saves_cursor_and_sends(self, monkeypatch, tmp_path,
+                                             homework_module):
+        calls = self.mock_api(monkeypatch, self.RESPONSE)
+        bots = self.mock_bot(monkeypatch)
+        path = str(tmp_path / 'state.sqlite3')
+        with Storage(path) as storage:
+            storage.register('42', 'secret', 100)
+            sent = homework_module.run_once(storage, storage.load_due(1e12))
+        assert sent == 1
+        assert calls[0]['params'] == {'from_date': 100}
+        assert calls[0]['headers']['Authorization'] == 'OAuth secret'
+        assert (bots[0].chat_id, bots[0].text) == (
+            '42', homework_module.render_change(
+                homework_module.StatusChange(
+                    '42', 1, 'hw1', None, 'approved', 0)
+            )
+        )
+        with Storage(path) as storage:
+            subscription = storage.load_subscription('42')
+            assert subscription.cursor == 1000198991
+            assert subscription.next_due > 0
+            assert homework_module.run_once(storage, [subscription]) == 0
+
+    def test_lost_state_does_not_notify_twice(self, monkeypatch, tmp_path,
+                                              homework_module):
+        self.mock_api(monkeypatch, self.RESPONSE)
+        bots = self.mock_bot(monkeypatch)
+        path = str(tmp_path / 'state.sqlite3')
+        for _ in range(2):
+            with Storage(path) as storage:
+                # The run crashes after sending, before saving the state.
+                monkeypatch.setattr(storage, 'save', lambda subscriptions: 0)
+                storage.register('42', 'secret', 100)
+                homework_module.run_once(storage, storage.load_all())
+        assert [hasattr(bot, 'text') for bot in bots] == [True, False]
+
+    def test_no_changes_no_bot(self, monkeypatch, tmp_path,
+                               homework_module):
+        self.mock_api(monkeypatch, {'homeworks': [], 'current_date': 5})
+        bots = self.mock_bot(monkeypatch)
+        with Storage(str(tmp_path / 'state.sqlite3')) as storage:
+            storage.register('42', 'secret', 100)
+            assert homework_module.run_once(storage, storage.load_all()) == 0
+        assert bots == []
+
+    def test_cli_batch(self, monkeypatch, tmp_path, homework_module):
+        self.mock_api(monkeypatch, self.RESPONSE)
+        self.mock_bot(monkeypatch)
+        monkeypatch.setattr(homework_module, 'TELEGRAM_TOKEN', '1234:abc')
+        tokens = tmp_path / 'tokens.txt'
+        tokens.write_text('# chat token\n1 token1\n2 token2\n')
+        path = str(tmp_path / 'state.sqlite3')
+        homework_module.cli(['--batch', '--tokens', str(tokens),
+                             '--state', path])
+        with Storage(path) as storage:
+            assert [
+                subscription.cursor for subscription in storage.load_all()
+            ] == [1000198991, 1000198991]
+
+    def test_operator_gets_one_digest(self, monkeypatch, tmp_path,
+                                      homework_module):
+        def failing_get(*args, **kwargs):
+            raise requests.RequestException('Service 503')
+
+        monkeypatch.setattr(requests, 'get', failing_get)
+        monkeypatch.setattr(homework_module, 'OPERATOR_CHAT_ID', 'ops')
+        bots = self.mock_bot(monkeypatch)
+        with Storage(str(tmp_path / 'state.sqlite3')) as storage:
+            for number in range(5):
+                storage.register(str(number), f'token{number}')
+            assert homework_module.run_once(storage, storage.load_all()) == 0
+        assert len(bots) == 1
+        assert bots[0].chat_id == 'ops'
+        assert bots[0].text.startswith('Error digest:\n5 × ')
+
+    def test_cli_once_uses_rotated_token(self, monkeypatch, tmp_path,
+                                         homework_module):
+        calls = self.mock_api(monkeypatch, self.RESPONSE)
+        self.mock_bot(monkeypatch)
+        monkeypatch.setattr(homework_module, 'TELEGRAM_TOKEN', '1234:abc')
+        monkeypatch.setattr(homework_module, 'TELEGRAM_CHAT_ID', '42')
+        path = str(tmp_path / 'state.sqlite3')
+        with Storage(path) as storage:
+            storage.register('42', 'old', 100)
+        monkeypatch.setattr(homework_module, 'PRACTICUM_TOKEN', 'new')
+        homework_module.cli(['--once', '--state', path])
+        assert calls[0]['headers']['Authorization'] == 'OAuth new'
+        with Storage(path) as storage:
+            assert storage.load_subscription('42').token == 'new'
+
+    def test_run_once_sends_every_change(self, monkeypatch, tmp_path,
+                                         homework_module):
+        self.mock_api(monkeypatch, self.RESPONSE)
+        sent = []
+
+        class CountingBot(utils.MockTelegramBot):
+            def send_message(self, chat_id=None, text=None, **kwargs):
+                sent.append(chat_id)
+
+        monkeypatch.setattr(telegram, 'Bot', lambda **kwargs: CountingBot())
+        with Storage(str(tmp_path / 'state.sqlite3')) as storage:
+            # More changes than the queue of the Telegram sink holds.
+            for number in range(150):
+                storage.register(str(number), f'token{number}')
+            assert homework_module.run_once(storage, storage.load_all()) == 150
+            assert storage.failures() == []
+        assert len(sent) == 150
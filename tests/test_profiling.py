@@ -0,0 +1,93 @@
+import json
+import os
+import signal
+import time
+
+import pytest
+
+import utils
+from metrics import Metrics
+from profiling import CPROFILE, SAMPLE, Profiler
+
+
+class TestProfiling:
+
+    def test_disarmed_profiler_is_a_no_op(self, tmp_path):
+        profiler = Profiler(str(tmp_path / 'profiles'), metrics=Metrics())
+        with profiler.round():
+            with profiler.stage('get_api_answer'):
+                pass
+        assert profiler.round() is profiler.stage('send_message')
+        assert not os.path.exists(profiler.directory)
+        assert profiler.metrics.snapshot()['timings'] == {}
+
+    @pytest.mark.parametrize('mode, suffix', [
+        (CPROFILE, '.prof'), (SAMPLE, '.stacks'),
+    ])
+    def test_armed_rounds_are_dumped(self, tmp_path, mode, suffix):
+        profiler = Profiler(str(tmp_path), mode, metrics=Metrics())
+        profiler.arm(2)
+        for _ in range(3):
+            with profiler.round():
+                with profiler.stage('get_api_answer'):
+                    time.sleep(0.02)
+        files = sorted(os.listdir(tmp_path))
+        assert len([name for name in files if name.endswith(suffix)]) == 2
+        (stages,) = [name for name in files if name.endswith('stages.json')]
+        summary = json.loads((tmp_path / stages).read_text())
+        assert summary['stage.get_api_answer']['count'] == 2
+        assert not profiler.active
+
+    def test_failing_round_is_counted(self, tmp_path):
+        profiler = Profiler(str(tmp_path), metrics=Metrics())
+        profiler.arm(1)
+        with pytest.raises(ValueError):
+            with profiler.round():
+                raise ValueError
+        assert not profiler.active
+
+    def test_stage_timers_without_profiling(self, tmp_path):
+        profiler = Profiler(str(tmp_path), metrics=Metrics())
+        profiler.stage_timers = True
+        with profiler.stage('check_response'):
+            pass
+        assert profiler.metrics.get_timing('stage.check_response').count == 1
+
+    @pytest.mark.parametrize('name, value', [
+        ('HOMEWORK_PROFILE', 'often'), ('HOMEWORK_PROFILE_MODE', 'trace'),
+    ])
+    def test_invalid_environment_disarms(self, monkeypatch, name, value):
+        monkeypatch.setenv(name, value)
+        profiler = Profiler.from_env()
+        assert not profiler.active
+        assert profiler.mode == CPROFILE
+
+    @pytest.mark.skipif(not hasattr(signal, 'SIGUSR1'),
+                        reason='no SIGUSR1 on this platform')
+    def test_signal_arms_profiler(self, tmp_path):
+        profiler = Profiler(str(tmp_path), metrics=Metrics())
+        previous = signal.getsignal(signal.SIGUSR1)
+        try:
+            assert profiler.install_signal(rounds=3)
+            os.kill(os.getpid(), signal.SIGUSR1)
+        finally:
+            signal.signal(signal.SIGUSR1, previous)
+        assert profiler.remaining == 3
+
+    def test_main_profiles_sends(self, monkeypatch, tmp_path,
+                                 homework_module):
+        profiler = Profiler(str(tmp_path), metrics=Metrics())
+        profiler.arm(1)
+        monkeypatch.setattr(homework_module, 'profiler', profiler)
+
+        class SlowBot(utils.MockTelegramBot):
+            def send_message(self, chat_id, text, **kwargs):
+                # Slower than the end of the round on a worker thread.
+                time.sleep(0.2)
+                super().send_message(chat_id, text, **kwargs)
+
+        utils.run_main(monkeypatch, homework_module, bot=SlowBot)
+        (stages,) = tmp_path.glob('*-stages.json')
+        summary = json.loads(stages.read_text())
+        assert summary['stage.send_message']['count'] == 1
+        assert summary['stage.parse_status']['count'] == 1
@@ -0,0 +1,120 @@
+import io
+import json
+import threading
+
+import pytest
+
+from changes import ChangeStream, StatusChange
+from clock import VirtualClock
+from metrics import registry
+from sinks import (BLOCK, DROP_NEW, DROP_OLDEST, JsonlSink, Pipeline, Sink,
+                   StreamSink, TelegramSink, build_sinks)
+
+CHANGE = StatusChange('1', 1, 'hw', None, 'approved', 0)
+
+
+class BlockedSink(Sink):
+    name = 'blocked'
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.release = threading.Event()
+        self.received = []
+
+    def deliver(self, change):
+        self.release.wait(5)
+        self.received.append(change)
+
+
+class TestSinks:
+
+    def test_jsonl_sink_appends_records(self, tmp_path):
+        path = tmp_path / 'changes.jsonl'
+        stream = ChangeStream()
+        pipeline = Pipeline([JsonlSink(str(path))])
+        pipeline.attach(stream)
+        stream.publish(CHANGE)
+        stream.publish(CHANGE._replace(homework_id=2))
+        pipeline.close()
+        records = [json.loads(line) for line in path.read_text().splitlines()]
+        assert [record['homework_id'] for record in records] == [1, 2]
+        assert records[0]['status'] == 'approved'
+
+    def test_inline_sink(self):
+        output = io.StringIO()
+        sink = StreamSink(output, maxsize=0)
+        sink.offer(CHANGE)
+        assert json.loads(output.getvalue())['homework_name'] == 'hw'
+
+    def test_switch_to_inline_drains_queue(self):
+        sink = BlockedSink(maxsize=10)
+        sink.start()
+        sink.offer(CHANGE._replace(homework_id=1))
+        sink.release.set()
+        sink.deliver_inline(True)
+        assert sink.depth == 0
+        sink.offer(CHANGE._replace(homework_id=2))
+        assert [change.homework_id for change in sink.received] == [1, 2]
+        sink.deliver_inline(False)
+        sink.stop()
+
+    def test_telegram_sink_renders(self):
+        sent = []
+        sink = TelegramSink('bot', lambda change: change.homework_name,
+                            lambda *args: sent.append(args), maxsize=0)
+        sink.offer(CHANGE)
+        assert sent == [('bot', '1', 'hw')]
+
+    @pytest.mark.parametrize('policy, expected, dropped', [
+        (DROP_NEW, [1, 2], 3), (DROP_OLDEST, [1, 3], 2), (BLOCK, [1, 2], 3),
+    ])
+    def test_backpressure(self, policy, expected, dropped):
+        failures = []
+        sink = BlockedSink(maxsize=1, policy=policy, block_timeout=0.01,
+                           on_failure=lambda *args: failures.append(args))
+        sink.start()
+        sink.offer(CHANGE._replace(homework_id=1))
+        while sink.depth:
+            pass
+        sink.offer(CHANGE._replace(homework_id=2))
+        sink.offer(CHANGE._replace(homework_id=3))
+        assert sink.dropped == 1
+        sink.release.set()
+        sink.stop()
+        assert [change.homework_id for change in sink.received] == expected
+        assert [(change.homework_id, error) for change, error in failures] == [
+            (dropped, 'Sink blocked is full')
+        ]
+
+    def test_failing_sink_is_counted(self):
+        sink = StreamSink(maxsize=0)
+        sink.stream = None
+        sink.offer(CHANGE)
+        assert (sink.failed, sink.delivered) == (1, 0)
+
+    def test_unsent_message_is_reported(self):
+        failures = []
+        sink = TelegramSink('bot', lambda change: change.homework_name,
+                            lambda *args: False, maxsize=0,
+                            on_failure=lambda *args: failures.append(args))
+        sink.offer(CHANGE)
+        assert sink.failed == 1
+        assert failures == [(CHANGE, 'Message not sent')]
+
+    def test_latency_on_clock(self):
+        class ClockedSink(Sink):
+            name = 'clocked'
+
+            def deliver(self, change):
+                pass
+
+        sink = ClockedSink(maxsize=0, clock=VirtualClock(1000))
+        sink.offer(CHANGE._replace(updated=400))
+        timing = registry.get_timing('sink.clocked.e2e_latency')
+        assert list(timing.samples)[-1] == 600
+
+    def test_build_sinks(self):
+        sinks = build_sinks('jsonl:out.jsonl, stdout,webhook:http://x/hook')
+        assert [sink.name for sink in sinks] == ['jsonl', 'stream', 'webhook']
+        with pytest.raises(ValueError):
+            build_sinks('carrier-pigeon')
@@ -0,0 +1,30 @@
+import soak
+from clock import VirtualClock
+
+
+class TestSoak:
+
+    def test_virtual_clock_sleeps_instantly(self):
+        slept = []
+        clock = VirtualClock(1000, on_sleep=slept.append)
+        clock.sleep(600)
+        assert (clock.time(), clock.elapsed, slept) == (1600, 600, [600])
+
+    def test_growth_ignores_warm_up_and_spikes(self):
+        samples = [soak.Sample(number, 0, objects) for number, objects in
+                   enumerate([100, 900, 500, 500, 5000, 500, 500, 500])]
+        assert soak.growth(samples, 'objects') == 0
+        samples = [soak.Sample(number, 0, 100 * number)
+                   for number in range(8)]
+        assert soak.growth(samples, 'objects') == 300
+
+    def test_short_soak(self, monkeypatch, tmp_path, homework_module):
+        # A deployed bot has its real state store configured.
+        state = tmp_path / 'state.sqlite3'
+        monkeypatch.setattr(homework_module, 'STATE_FILE', str(state))
+        report = soak.soak(120, sample_every=40)
+        assert not state.exists()
+        assert report.rounds == report.requests == 120
+        assert report.virtual_seconds == 120 * homework_module.RETRY_PERIOD
+        assert report.messages > 0
+        assert [sample.round for sample in report.samples] == [40, 80, 120]
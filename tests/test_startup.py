@@ -0,0 +1,43 @@
+import os
+import subprocess
+import sys
+
+from lazy import lazy_import
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class TestStartup:
+
+    def run(self, script):
+        environment = {
+            key: value for key, value in os.environ.items()
+            if key not in ('PRACTICUM_TOKEN', 'TELEGRAM_TOKEN',
+                           'TELEGRAM_CHAT_ID')
+        }
+        return subprocess.run(
+            [sys.executable, '-c', script], cwd=ROOT, env=environment,
+            capture_output=True, text=True,
+        )
+
+    def test_heavy_modules_are_not_imported(self):
+        result = self.run(
+            'import sys, homework\n'
+            'print(type(sys.modules["telegram"]).__name__,\n'
+            '      type(sys.modules["requests"]).__name__)'
+        )
+        assert result.stdout.split() == ['_LazyModule', '_LazyModule']
+
+    def test_missing_tokens_exit_before_heavy_imports(self):
+        result = self.run(
+            'import sys, homework\n'
+            'try:\n'
+            '    homework.main()\n'
+            'except SystemExit:\n'
+            '    pass\n'
+            'print(type(sys.modules["telegram"]).__name__)'
+        )
+        assert result.stdout.split()[-1] == '_LazyModule'
+
+    def test_lazy_import_returns_loaded_module(self):
+        assert lazy_import('os') is os
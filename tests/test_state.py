@@ -0,0 +1,76 @@
+import os
+import sys
+
+import pytest
+
+from state import (StateStore, Subscription, decode_status, encode_status,
+                   homework_key, parse_date)
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), 'benchmarks'))
+
+from bench_state import (TARGET_BYTES, TARGET_HISTORY_SECONDS,  # noqa: E402
+                         bytes_per_subscription, history_seconds)
+
+
+class TestState:
+
+    def test_status_codes_round_trip(self, homework_module):
+        for status in homework_module.HOMEWORK_VERDICTS:
+            assert decode_status(encode_status(status)) == status
+        with pytest.raises(ValueError):
+            encode_status('unknown')
+
+    def test_homework_key(self):
+        assert homework_key({'id': 7, 'homework_name': 'hw'}) == 7
+        assert (homework_key({'homework_name': 'hw'})
+                == homework_key({'homework_name': 'hw'}))
+
+    def test_parse_date(self):
+        assert parse_date('2020-02-13T14:40:57Z') == 1581604857
+        assert parse_date(None) == 0
+
+    def test_subscription_records(self):
+        subscription = Subscription('1', 'token')
+        first = subscription.update({
+            'id': 1, 'homework_name': 'hw1', 'status': 'reviewing',
+            'date_updated': '2020-02-13T14:40:57Z'
+        })
+        subscription.update({'id': 2, 'homework_name': 'hw2',
+                             'status': 'approved'})
+        subscription.set(1, 'hw1', encode_status('approved'), 1581604900)
+
+        assert len(subscription) == 2
+        assert subscription.get(1) == first._replace(
+            status=encode_status('approved'), updated=1581604900
+        )
+        assert subscription.get(3) is None
+        assert [record.name for record in subscription.records()] == [
+            'hw1', 'hw2'
+        ]
+
+    def test_long_history_is_indexed(self):
+        subscription = Subscription('1', 'token')
+        for number in range(40):
+            subscription.set(number, f'hw{number}', 0, number)
+        subscription.set(20, 'renamed', 1, 0)
+        assert len(subscription) == 40
+        assert subscription.get(20) == (20, 'renamed', 1, 0)
+        assert subscription.get(39).updated == 39
+        assert subscription.get(40) is None
+        assert [record.homework_id for record in subscription.records()] == (
+            list(range(40))
+        )
+
+    def test_long_history_is_linear(self):
+        assert history_seconds() < TARGET_HISTORY_SECONDS
+
+    def test_store_subscribe(self):
+        store = StateStore()
+        subscription = store.subscribe('1', 'token', 100)
+        assert store.subscribe('1', 'other') is subscription
+        assert store.get('1').cursor == 100
+        assert list(store) == [subscription]
+
+    def test_memory_per_subscription(self):
+        assert bytes_per_subscription(count=10_000) < TARGET_BYTES
@@ -0,0 +1,64 @@
+from changes import StatusChange
+from clock import VirtualClock
+from state import Subscription
+from storage import Storage
+
+
+class TestStorage:
+
+    def make_subscription(self, chat_id, next_due=0.0):
+        subscription = Subscription(chat_id, f'token{chat_id}', 100, next_due)
+        subscription.set(1, 'hw1', 0, 1581604857)
+        subscription.set(2, 'hw2', 2, 1581604900)
+        return subscription
+
+    def test_round_trip(self, tmp_path):
+        path = str(tmp_path / 'state.sqlite3')
+        with Storage(path) as storage:
+            storage.save([self.make_subscription('1')])
+        with Storage(path) as storage:
+            subscription = storage.load_subscription('1')
+        assert (subscription.token, subscription.cursor) == ('token1', 100)
+        assert list(subscription.records()) == list(
+            self.make_subscription('1').records()
+        )
+
+    def test_load_due_is_ordered(self, tmp_path):
+        with Storage(str(tmp_path / 'state.sqlite3')) as storage:
+            storage.save([
+                self.make_subscription('1', 30.0),
+                self.make_subscription('2', 10.0),
+                self.make_subscription('3', 99.0),
+            ])
+            due = storage.load_due(50.0)
+            assert [subscription.chat_id for subscription in due] == [
+                '2', '1'
+            ]
+            assert all(len(subscription) == 2 for subscription in due)
+            assert len(storage.load_due(50.0, limit=1)) == 1
+
+    def test_register_keeps_existing_cursor(self, tmp_path):
+        with Storage(str(tmp_path / 'state.sqlite3')) as storage:
+            assert storage.register('1', 'token', 100)
+            assert not storage.register('1', 'token', 200)
+            assert storage.load_subscription('1').cursor == 100
+            assert storage.load_subscription('2') is None
+
+    def test_register_updates_token(self, tmp_path):
+        with Storage(str(tmp_path / 'state.sqlite3')) as storage:
+            storage.register('1', 'old', 100)
+            assert not storage.register('1', 'new', 200)
+            assert storage.load_subscription('1').token == 'old'
+            assert storage.register('1', 'new', 200, update_token=True)
+            assert not storage.register('1', 'new', 300, update_token=True)
+            subscription = storage.load_subscription('1')
+            assert (subscription.token, subscription.cursor) == ('new', 100)
+
+    def test_failures_stamped_on_clock(self, tmp_path):
+        path = str(tmp_path / 'state.sqlite3')
+        with Storage(path, VirtualClock(1000)) as storage:
+            storage.record_failure(
+                StatusChange('1', 1, 'hw1', None, 'approved', 900), 'down'
+            )
+            (failure,) = storage.failures()
+        assert failure[2:] == ('down', 1000)
@@ -0,0 +1,78 @@
+import json
+import tracemalloc
+
+import pytest
+
+from streaming import HomeworkStream
+
+HOMEWORK = {
+    'id': 123,
+    'status': 'approved',
+    'homework_name': 'username__hw_python_oop.zip',
+    'reviewer_comment': 'Всё нравится',
+    'date_updated': '2020-02-13T14:40:57Z',
+    'lesson_name': 'Итоговый проект',
+}
+
+
+def chunked(body: bytes, size: int):
+    for start in range(0, len(body), size):
+        yield body[start:start + size]
+
+
+class TestStreaming:
+
+    @pytest.mark.parametrize('size', [1, 3, 7, 64, 100000])
+    def test_matches_json_loads(self, size):
+        data = {
+            'current_date': 1581604857,
+            'homeworks': [dict(HOMEWORK, id=number) for number in range(20)],
+            'extra': {'nested': [1, 2.5, None, True]},
+        }
+        body = json.dumps(data, ensure_ascii=False, indent=1).encode()
+        closed = []
+        stream = HomeworkStream(chunked(body, size),
+                                lambda: closed.append(True))
+        assert list(stream) == data['homeworks']
+        assert stream.current_date == 1581604857
+        assert stream.fields['extra'] == data['extra']
+        assert closed == [True]
+
+    def test_empty_homeworks(self):
+        stream = HomeworkStream([b'{"homeworks": [], "current_date": 5}'])
+        assert list(stream) == []
+        assert stream.current_date == 5
+
+    @pytest.mark.parametrize('body', [
+        b'[{"homeworks": [], "current_date": 5}]',
+        b'{"current_date": 5}',
+        b'{"homeworks": {"status": "approved"}, "current_date": 5}',
+        b'{"homeworks": null, "current_date": 5}',
+        b'{"homeworks": [1], "current_date": 5}',
+        b'{"homeworks": [], "current_date": "today"}',
+    ])
+    def test_invalid_response(self, body):
+        with pytest.raises(TypeError):
+            list(HomeworkStream(chunked(body, 4)))
+
+    def test_truncated_response(self):
+        with pytest.raises(ValueError):
+            list(HomeworkStream([b'{"homeworks": [{"id": 1']))
+
+    def test_memory_is_flat(self):
+        item = json.dumps(HOMEWORK, ensure_ascii=False).encode()
+        count = 20_000
+        per_chunk = 50
+
+        def body():
+            yield b'{"current_date": 1, "homeworks": [' + item
+            for _ in range(count // per_chunk - 1):
+                yield (b',' + item) * per_chunk
+            yield (b',' + item) * (per_chunk - 1) + b']}'
+
+        tracemalloc.start()
+        seen = sum(1 for _ in HomeworkStream(body()))
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        assert seen == count
+        assert peak < 1024 * 1024 < count * len(item)
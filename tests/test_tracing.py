@@ -0,0 +1,99 @@
+import json
+
+import pytest
+
+from changes import ChangeStream, StatusChange
+from sinks import Pipeline, Sink
+from tracing import (JsonlExporter, OtlpHttpExporter, Span, Tracer,
+                     latency_report, tracer)
+
+
+class ListExporter:
+    def __init__(self):
+        self.spans = []
+
+    def export(self, span):
+        self.spans.append(span)
+
+    def close(self):
+        pass
+
+
+class NullSink(Sink):
+    name = 'telegram'
+
+    def deliver(self, change):
+        pass
+
+
+@pytest.fixture
+def exported():
+    exporter = ListExporter()
+    tracer.configure([exporter])
+    yield exporter.spans
+    tracer.configure([])
+
+
+class TestTracing:
+
+    def test_disabled_tracer_is_a_no_op(self):
+        disabled = Tracer()
+        with disabled.span('poll') as span:
+            span.set_attribute('key', 'value')
+            assert disabled.current() is None
+
+    def test_nested_spans_share_trace(self, exported):
+        with tracer.span('poll', chat_id='1') as root:
+            with tracer.span('get_api_answer'):
+                pass
+        child, parent = exported
+        assert parent is root and parent.parent_id is None
+        assert child.trace_id == root.trace_id
+        assert child.parent_id == root.span_id
+        assert len(root.trace_id) == 32 and root.attributes == {
+            'chat_id': '1'
+        }
+
+    def test_error_is_recorded(self, exported):
+        with pytest.raises(ValueError):
+            with tracer.span('check_response'):
+                raise ValueError('bad')
+        assert exported[0].error == 'ValueError: bad'
+
+    def test_delivery_joins_polling_trace(self, exported):
+        stream = ChangeStream()
+        pipeline = Pipeline([NullSink()])
+        pipeline.attach(stream)
+        with tracer.span('poll') as root:
+            stream.publish(StatusChange('1', 1, 'hw', None, 'approved', 1))
+        pipeline.close()
+        names = {span.name: span for span in exported}
+        assert {'queue.wait', 'telegram.deliver'} <= set(names)
+        assert names['queue.wait'].parent_id == root.span_id
+        assert names['telegram.deliver'].trace_id == root.trace_id
+        assert names['telegram.deliver'].attributes['e2e_latency'] > 0
+
+    def test_jsonl_export_and_latency_report(self, tmp_path):
+        path = str(tmp_path / 'traces.jsonl')
+        jsonl = Tracer([JsonlExporter(path)])
+        for latency in (1.0, 2.0, 3.0):
+            with jsonl.span('telegram.deliver', e2e_latency=latency):
+                pass
+        jsonl.close()
+        report = latency_report(path)
+        assert (report['count'], report['p50']) == (3, 2.0)
+
+    def test_otlp_payload(self):
+        exporter = OtlpHttpExporter('http://localhost:4318/', interval=60)
+        span = Span('poll', 'a' * 32, attempt=2, ok=True)
+        span.end_ns = span.start_ns + 10
+        payload = exporter.payload([span])
+        exporter.close()
+        assert exporter.url == 'http://localhost:4318/v1/traces'
+        (otlp_span,) = payload['resourceSpans'][0]['scopeSpans'][0]['spans']
+        assert otlp_span['traceId'] == 'a' * 32
+        assert otlp_span['attributes'] == [
+            {'key': 'attempt', 'value': {'intValue': '2'}},
+            {'key': 'ok', 'value': {'boolValue': True}},
+        ]
+        json.dumps(payload)
@@ -0,0 +1,146 @@
+import gzip
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+import requests
+
+import transport
+import utils
+from metrics import Metrics, registry
+
+
+class GzipHandler(BaseHTTPRequestHandler):
+    body = json.dumps({
+        'homeworks': [{
+            'id': number,
+            'homework_name': f'student__hw{number}.zip',
+            'status': 'approved',
+            'reviewer_comment': 'Всё нравится, ' * 20,
+            'date_updated': '2020-02-13T14:40:57Z',
+            'lesson_name': 'Итоговый проект',
+        } for number in range(50)],
+        'current_date': 1581604857,
+    }).encode()
+
+    def do_GET(self):
+        type(self).accept_encoding = self.headers['Accept-Encoding']
+        body = gzip.compress(self.body)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def gzip_endpoint(monkeypatch, homework_module):
+    server = HTTPServer(('127.0.0.1', 0), GzipHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(homework_module, 'ENDPOINT',
+                        f'http://127.0.0.1:{server.server_port}/')
+    yield
+    server.shutdown()
+
+
+class TestTransport:
+
+    def test_default_timeout_until_enough_samples(self):
+        timeouts = transport.AdaptiveTimeout('api', Metrics(), min_samples=5)
+        assert timeouts.timeout() == (3.05, 10.0)
+        assert timeouts.hedge_delay() is None
+        for _ in range(5):
+            timeouts.observe(0.2)
+        assert timeouts.timeout() == (3.05, 5.0)
+        for _ in range(100):
+            timeouts.observe(4.0)
+        assert timeouts.timeout() == (3.05, 8.0)
+        assert timeouts.hedge_delay() == 4.0
+
+    def test_timeout_widens_after_timeouts(self):
+        timeouts = transport.AdaptiveTimeout('api', Metrics(), min_samples=5)
+        # Too few timeouts to move p99 of the window.
+        for _ in range(1000):
+            timeouts.observe(0.3)
+        reads = []
+        for _ in range(3):
+            read = timeouts.timeout()[1]
+            timeouts.expired(read, read)
+            reads.append(timeouts.timeout()[1])
+        assert reads == [10.0, 20.0, 30.0]
+        for _ in range(3):
+            timeouts.observe(1.5)
+            reads.append(timeouts.timeout()[1])
+        assert reads[3:] == [15.0, 7.5, 5.0]
+        assert timeouts.widened is None
+
+    def test_hedged_call_uses_faster_answer(self):
+        metrics = Metrics()
+        release = threading.Event()
+        calls = []
+
+        def call():
+            calls.append(len(calls))
+            if len(calls) == 1:
+                release.wait(5)
+                return 'slow'
+            return 'fast'
+
+        assert transport.hedged_call(call, 0.01, metrics) == 'fast'
+        release.set()
+        assert metrics.counters == {'http.hedged': 1, 'http.hedge_wins': 1}
+
+    def test_fast_call_is_not_hedged(self):
+        metrics = Metrics()
+        assert transport.hedged_call(lambda: 'ok', 1, metrics) == 'ok'
+        assert metrics.counters == {}
+
+    def test_hedged_call_raises_when_both_fail(self):
+        def call():
+            raise requests.Timeout('slow')
+
+        with pytest.raises(requests.Timeout):
+            transport.hedged_call(call, 0, Metrics())
+
+    def test_api_requests_have_timeout(self, monkeypatch, homework_module):
+        seen = []
+
+        def mock_get(*args, **kwargs):
+            seen.append(kwargs['timeout'])
+            return utils.MockResponseGET(*args, random_timestamp=1, **kwargs)
+
+        monkeypatch.setattr(requests, 'get', mock_get)
+        homework_module.get_api_answer(0)
+        connect, read = seen[0]
+        assert 0 < connect and 0 < read <= 30
+
+    def test_compressed_poll_is_measured(self, gzip_endpoint,
+                                         homework_module):
+        before = dict(registry.counters)
+        answer = homework_module.request_api(0, {'Authorization': 'OAuth x'})
+        assert 'gzip' in GzipHandler.accept_encoding
+        wire = (registry.counters['poll.bytes_wire_total']
+                - before.get('poll.bytes_wire_total', 0))
+        decoded = (registry.counters['poll.bytes_decoded_total']
+                   - before.get('poll.bytes_decoded_total', 0))
+        assert decoded == len(GzipHandler.body)
+        assert 0 < wire < decoded / 5
+        assert registry.get_timing('poll.decode_seconds').count
+        assert set(answer['homeworks'][0]) == set(
+            homework_module.HOMEWORK_FIELDS
+        )
+
+    def test_compressed_stream_is_measured(self, gzip_endpoint,
+                                           homework_module):
+        before = registry.counters.get('stream.bytes_wire_total', 0)
+        homeworks = homework_module.stream_api(0, {})
+        assert len(list(homeworks)) == 50
+        assert homeworks.bytes_read == len(GzipHandler.body)
+        wire = registry.counters['stream.bytes_wire_total'] - before
+        assert 0 < wire < homeworks.bytes_read / 5
@@ -5,6 +5,12 @@ from http import HTTPStatus
 from inspect import signature
 from types import ModuleType
 
+import pytest
+import requests
+import telegram
+
+from clock import VirtualClock
+
 
 def check_function(scope: ModuleType, func_name: str, params_qty: int = 0):
     """If scope has a function with specific name and params with qty."""
@@ -103,3 +109,46 @@ class MockTelegramBot:
 
 class BreakInfiniteLoop(Exception):
     pass
+
+
+HOMEWORK = {'id': 1, 'homework_name': 'hw1', 'status': 'approved'}
+
+
+def answer_with(homeworks=(HOMEWORK,), current_date=1600):
+    """Fake requests.get answering with the given homeworks."""
+    def get(*args, **kwargs):
+        response = MockResponseGET(*args, **kwargs)
+        response.json = lambda: {'homeworks': list(homeworks),
+                                 'current_date': current_date}
+        return response
+
+    return get
+
+
+def run_main(monkeypatch, homework_module, rounds=1, get=None,
+             bot=MockTelegramBot, state_file=''):
+    """Running main() for a number of rounds on a virtual clock.
+
+    Tokens are set, Practicum answers with get (one approved homework by
+    default), Telegram is a bot made by bot, and the state and metrics go
+    nowhere unless state_file is given. Returns the clock and the sleeps.
+    """
+    clock = VirtualClock(1000)
+    sleeps = []
+
+    def end_round(seconds):
+        sleeps.append(seconds)
+        if len(sleeps) == rounds:
+            raise BreakInfiniteLoop
+
+    clock.on_sleep = end_round
+    for name in ('PRACTICUM_TOKEN', 'TELEGRAM_TOKEN', 'TELEGRAM_CHAT_ID'):
+        monkeypatch.setattr(homework_module, name, 'secret')
+    monkeypatch.setattr(homework_module, 'runtime', clock)
+    monkeypatch.setattr(homework_module, 'STATE_FILE', state_file)
+    monkeypatch.setattr(homework_module, 'METRICS_FILE', '')
+    monkeypatch.setattr(telegram, 'Bot', lambda **kwargs: bot())
+    monkeypatch.setattr(requests, 'get', get or answer_with())
+    with pytest.raises(BreakInfiniteLoop):
+        homework_module.main()
+    return clock, sleeps
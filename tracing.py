@@ -0,0 +1,310 @@
+"""Trace spans of polling rounds and deliveries.
+
+Every polling round starts a trace; API calls, validation, rendering,
+queue waits and sends are recorded as spans of it. Finished spans go to
+exporters: a JSONL file (HOMEWORK_TRACE_FILE) or an OTLP/HTTP collector
+(HOMEWORK_OTLP_ENDPOINT). Without exporters tracing is a no-op.
+"""
+import contextvars
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Iterable, List, Optional
+
+from lazy import lazy_import
+from metrics import percentile
+
+requests = lazy_import('requests')
+
+logger = logging.getLogger(__name__)
+
+_current = contextvars.ContextVar('span', default=None)
+
+
+class Span:
+    """A timed operation of a trace."""
+
+    __slots__ = ('trace_id', 'span_id', 'parent_id', 'name', 'start_ns',
+                 'end_ns', 'attributes', 'error')
+
+    def __init__(self, name: str, trace_id: str,
+                 parent_id: Optional[str] = None,
+                 start_ns: Optional[int] = None, **attributes) -> None:
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.start_ns = start_ns or time.time_ns()
+        self.end_ns = None
+        self.attributes = attributes
+        self.error = None
+
+    def set_attribute(self, key: str, value) -> None:
+        """Attaching an attribute to the span."""
+        self.attributes[key] = value
+
+    @property
+    def duration(self) -> float:
+        """Duration of a finished span in seconds."""
+        return (self.end_ns - self.start_ns) / 1e9
+
+    def to_dict(self) -> dict:
+        """Representing the span with OTLP field names."""
+        return {
+            'traceId': self.trace_id,
+            'spanId': self.span_id,
+            'parentSpanId': self.parent_id or '',
+            'name': self.name,
+            'startTimeUnixNano': self.start_ns,
+            'endTimeUnixNano': self.end_ns,
+            'attributes': self.attributes,
+            'status': {'code': 2, 'message': self.error}
+            if self.error else {'code': 1},
+        }
+
+
+class _NoopSpan:
+    """Span of a disabled tracer."""
+
+    trace_id = span_id = None
+
+    def set_attribute(self, key: str, value) -> None:
+        """Ignoring an attribute."""
+
+
+_NOOP = nullcontext(_NoopSpan())
+
+
+class JsonlExporter:
+    """Appends finished spans to a file, one JSON object per line."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def export(self, span: Span) -> None:
+        """Writing a span."""
+        line = json.dumps(span.to_dict(), ensure_ascii=False) + '\n'
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+
+    def close(self) -> None:
+        """Closing the file."""
+        with self._lock:
+            self._file.close()
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+class OtlpHttpExporter:
+    """Sends spans in batches to an OTLP/HTTP collector with JSON encoding.
+
+    Spans are queued and posted by a background thread; when the queue is
+    full new spans are dropped.
+    """
+
+    def __init__(self, endpoint: str, service: str = 'homework_bot',
+                 batch_size: int = 256, interval: float = 2.0,
+                 maxsize: int = 4096) -> None:
+        self.url = endpoint.rstrip('/') + '/v1/traces'
+        self.service = service
+        self.batch_size = batch_size
+        self.interval = interval
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name='otlp-exporter', daemon=True
+        )
+        self._thread.start()
+
+    def export(self, span: Span) -> None:
+        """Queueing a span."""
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+
+    def payload(self, spans: List[Span]) -> dict:
+        """Building an OTLP ExportTraceServiceRequest."""
+        otlp_spans = []
+        for span in spans:
+            data = span.to_dict()
+            data['kind'] = 1
+            data['startTimeUnixNano'] = str(span.start_ns)
+            data['endTimeUnixNano'] = str(span.end_ns)
+            data['attributes'] = [
+                {'key': key, 'value': _otlp_value(value)}
+                for key, value in span.attributes.items()
+            ]
+            otlp_spans.append(data)
+        return {'resourceSpans': [{
+            'resource': {'attributes': [{
+                'key': 'service.name',
+                'value': {'stringValue': self.service},
+            }]},
+            'scopeSpans': [{
+                'scope': {'name': __name__}, 'spans': otlp_spans,
+            }],
+        }]}
+
+    def _drain(self) -> List[Span]:
+        spans = []
+        while len(spans) < self.batch_size:
+            try:
+                spans.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return spans
+
+    def _post(self, spans: List[Span]) -> None:
+        try:
+            requests.post(self.url, json=self.payload(spans), timeout=5)
+        except requests.RequestException as error:
+            logger.warning(f'Spans not exported: {error}')
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            spans = self._drain()
+            while spans:
+                self._post(spans)
+                spans = self._drain()
+
+    def close(self) -> None:
+        """Sending the remaining spans and stopping."""
+        self._stop.set()
+        self._thread.join()
+        spans = self._drain()
+        while spans:
+            self._post(spans)
+            spans = self._drain()
+
+
+class Tracer:
+    """Creates spans and passes finished ones to exporters."""
+
+    def __init__(self, exporters: Iterable = ()) -> None:
+        self.exporters = list(exporters)
+
+    @property
+    def enabled(self) -> bool:
+        """Whether any exporter is configured."""
+        return bool(self.exporters)
+
+    def configure(self, exporters: Iterable) -> None:
+        """Replacing the exporters."""
+        self.close()
+        self.exporters = list(exporters)
+
+    def current(self) -> Optional[Span]:
+        """Span active in the current context."""
+        return _current.get()
+
+    def span(self, name: str, parent: Optional[Span] = None, **attributes):
+        """Context of a new span, a child of parent or the current span."""
+        if not self.exporters:
+            return _NOOP
+        return self._span(name, parent, attributes)
+
+    @contextmanager
+    def _span(self, name: str, parent: Optional[Span], attributes: dict):
+        parent = parent or _current.get()
+        span = Span(
+            name,
+            parent.trace_id if parent else os.urandom(16).hex(),
+            parent.span_id if parent else None,
+            **attributes,
+        )
+        token = _current.set(span)
+        try:
+            yield span
+        except BaseException as error:
+            span.error = f'{type(error).__name__}: {error}'
+            raise
+        finally:
+            _current.reset(token)
+            self.finish(span)
+
+    def record(self, name: str, start_ns: int, end_ns: int,
+               parent: Optional[Span] = None, **attributes) -> None:
+        """Recording a span that already happened."""
+        if not self.exporters:
+            return
+        span = Span(
+            name,
+            parent.trace_id if parent else os.urandom(16).hex(),
+            parent.span_id if parent else None,
+            start_ns,
+            **attributes,
+        )
+        span.end_ns = end_ns
+        self._export(span)
+
+    def finish(self, span: Span) -> None:
+        """Ending a span and exporting it."""
+        span.end_ns = time.time_ns()
+        self._export(span)
+
+    def _export(self, span: Span) -> None:
+        for exporter in self.exporters:
+            try:
+                exporter.export(span)
+            except Exception as error:
+                logger.warning(f'Span not exported: {error}')
+
+    def close(self) -> None:
+        """Flushing and closing the exporters."""
+        for exporter in self.exporters:
+            exporter.close()
+        self.exporters = []
+
+
+def exporters_from_env() -> list:
+    """Building exporters configured in the environment."""
+    exporters = []
+    if os.getenv('HOMEWORK_TRACE_FILE'):
+        exporters.append(JsonlExporter(os.getenv('HOMEWORK_TRACE_FILE')))
+    if os.getenv('HOMEWORK_OTLP_ENDPOINT'):
+        exporters.append(
+            OtlpHttpExporter(os.getenv('HOMEWORK_OTLP_ENDPOINT'))
+        )
+    return exporters
+
+
+def latency_report(path: str, name: str = 'telegram.deliver') -> dict:
+    """Percentiles of end-to-end latency of deliveries in a JSONL trace."""
+    latencies = []
+    with open(path, encoding='utf-8') as file:
+        for line in file:
+            span = json.loads(line)
+            if span['name'] == name and 'e2e_latency' in span['attributes']:
+                latencies.append(span['attributes']['e2e_latency'])
+    return {
+        'count': len(latencies),
+        'p50': percentile(latencies, 0.5),
+        'p95': percentile(latencies, 0.95),
+        'p99': percentile(latencies, 0.99),
+    }
+
+
+tracer = Tracer()
+
+
+if __name__ == '__main__':
+    import sys
+
+    print(json.dumps(latency_report(*sys.argv[1:]), indent=2))
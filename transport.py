@@ -0,0 +1,184 @@
+"""HTTP calls with latency-adaptive timeouts and optional hedging.
+
+The read timeout of an endpoint follows its observed p99 latency, and
+widens at once after a request timed out. With hedging on, a second
+identical request is sent when the first one is slower than the p95
+latency, and whichever answers first is used.
+Responses are requested compressed and their size on the wire is
+recorded next to the decoded size.
+"""
+import importlib.util
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Optional, Tuple
+
+from metrics import Metrics, registry
+
+logger = logging.getLogger(__name__)
+
+ACCEPT_ENCODING = 'gzip, deflate'
+if any(importlib.util.find_spec(name) for name in ('brotli', 'brotlicffi')):
+    ACCEPT_ENCODING = 'br, ' + ACCEPT_ENCODING
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class AdaptiveTimeout:
+    """Timeouts of one endpoint derived from its latency percentiles.
+
+    A timed out request multiplies the read timeout by factor, up to
+    maximum, without waiting for the percentiles to move. Every answer in
+    time divides the widening again, down to what the answer needed.
+    """
+
+    def __init__(self, name: str, metrics: Metrics = registry,
+                 connect: float = 3.05, default: float = 10.0,
+                 minimum: float = 5.0, maximum: float = 30.0,
+                 factor: float = 2.0, min_samples: int = 20) -> None:
+        self.name = name
+        self.metrics = metrics
+        self.connect = connect
+        self.default = default
+        self.minimum = minimum
+        self.maximum = maximum
+        self.factor = factor
+        self.min_samples = min_samples
+        self.widened = None
+
+    def _percentile(self, fraction: float) -> Optional[float]:
+        timing = self.metrics.get_timing(f'http.{self.name}.latency')
+        if timing is None or len(timing.samples) < self.min_samples:
+            return None
+        return timing.percentile(fraction)
+
+    def timeout(self) -> Tuple[float, float]:
+        """Connect and read timeouts for the next request."""
+        p99 = self._percentile(0.99)
+        if p99 is None:
+            read = self.default
+        else:
+            read = min(self.maximum, max(self.minimum, p99 * self.factor))
+        if self.widened is not None:
+            read = max(read, self.widened)
+        return self.connect, read
+
+    def hedge_delay(self) -> Optional[float]:
+        """Delay before a hedged request, None until latency is known."""
+        return self._percentile(0.95)
+
+    def observe(self, seconds: float) -> None:
+        """Recording the latency of a request answered in time."""
+        self.metrics.timing(f'http.{self.name}.latency', seconds)
+        if self.widened is not None:
+            widened = max(self.widened / self.factor, seconds * self.factor)
+            self.widened = widened if widened > self.minimum else None
+
+    def expired(self, read: float, seconds: float) -> None:
+        """Recording a request timed out after read seconds."""
+        self.metrics.timing(f'http.{self.name}.latency', seconds)
+        self.widened = min(self.maximum, read * self.factor)
+
+
+_timeouts: Dict[str, AdaptiveTimeout] = {}
+
+
+def timeouts_for(endpoint: str) -> AdaptiveTimeout:
+    """Getting the adaptive timeout of an endpoint."""
+    timeout = _timeouts.get(endpoint)
+    if timeout is None:
+        timeout = _timeouts.setdefault(
+            endpoint, AdaptiveTimeout(endpoint.rstrip('/').split('/')[-1])
+        )
+    return timeout
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(8, thread_name_prefix='hedge')
+        return _executor
+
+
+def _close_response(future) -> None:
+    if not future.cancelled() and future.exception() is None:
+        close = getattr(future.result(), 'close', None)
+        if close is not None:
+            close()
+
+
+def hedged_call(call: Callable, delay: float,
+                metrics: Metrics = registry):
+    """Calling twice if the first call is slower than delay.
+
+    The first successful result wins; the other one is closed when it
+    arrives. If both fail, the error of the first call is raised.
+    """
+    executor = _get_executor()
+    first = executor.submit(call)
+    done, _ = wait([first], timeout=delay)
+    if done:
+        return first.result()
+    metrics.increment('http.hedged')
+    second = executor.submit(call)
+    pending = {first, second}
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                for loser in pending:
+                    loser.add_done_callback(_close_response)
+                if future is second:
+                    metrics.increment('http.hedge_wins')
+                return future.result()
+    return first.result()
+
+
+def get(request: Callable, url: str, hedge: bool = False, **kwargs):
+    """Sending a GET request with an adaptive timeout.
+
+    request is the function doing the call, like requests.get.
+    """
+    timeouts = timeouts_for(url)
+    connect, read = timeouts.timeout()
+    kwargs['timeout'] = (connect, read)
+    kwargs['headers'] = {
+        'Accept-Encoding': ACCEPT_ENCODING, **kwargs.get('headers', {})
+    }
+    delay = timeouts.hedge_delay() if hedge else None
+    started = time.perf_counter()
+    try:
+        if delay is None:
+            response = request(url, **kwargs)
+        else:
+            response = hedged_call(lambda: request(url, **kwargs), delay)
+    except Exception:
+        # A timed out request counts as one as slow as the timeout.
+        elapsed = time.perf_counter() - started
+        if elapsed >= read:
+            timeouts.expired(read, elapsed)
+        raise
+    timeouts.observe(time.perf_counter() - started)
+    return response
+
+
+def wire_bytes(response) -> Optional[int]:
+    """Bytes of a read response body as received, before decompression."""
+    tell = getattr(getattr(response, 'raw', None), 'tell', None)
+    return tell() if callable(tell) else None
+
+
+def record_transfer(name: str, response, decoded: int,
+                    decode_seconds: float,
+                    metrics: Metrics = registry) -> None:
+    """Recording bytes on the wire, decoded bytes and decode time."""
+    wire = wire_bytes(response)
+    if wire is not None:
+        metrics.timing(f'{name}.bytes_wire', wire)
+        metrics.increment(f'{name}.bytes_wire_total', wire)
+    metrics.timing(f'{name}.bytes_decoded', decoded)
+    metrics.increment(f'{name}.bytes_decoded_total', decoded)
+    metrics.timing(f'{name}.decode_seconds', decode_seconds)